@@ -4,22 +4,113 @@ for evaluating and logging metrics for the Gemini AI model,
 including OCR-based text extraction from medication images.
 """
 
+import asyncio
 from typing import List
-from PIL import Image
-from transformers import TrOCRProcessor, VisionEncoderDecoderModel
-from sentence_transformers import SentenceTransformer
-from langchain_google_genai import ChatGoogleGenerativeAI
+import numpy as np
 from langchain_core.prompts import ChatPromptTemplate
-from config import API_KEY
+from config import (API_KEY, EMBEDDING_MAX_BATCH, ENCODER_BACKEND, ONNX_MODEL_DIR, ONNX_THREADS,
+                    RERANKER_MODEL, EMBEDDING_MODEL)
+from embedding_service import EmbeddingService
+from model_registry import ModelRegistry
+from ocr_service import OcrService
+from name_resolver import NameResolver, Resolution
+from reranker import Reranker
 
-# Load SentenceTransformer model for embeddings
-embedding_model = SentenceTransformer("sentence-transformers/all-mpnet-base-v2")
+# pylint: disable=import-outside-toplevel
+# Les bibliothèques lourdes (torch, transformers, Gemini) sont importées dans
+# les loaders : importer ce module ne charge aucun modèle.
 
-# Initialize Gemini
-llm = ChatGoogleGenerativeAI(model="gemini-1.5-pro", temperature=0.5, google_api_key=API_KEY)
 
-processor = TrOCRProcessor.from_pretrained("microsoft/trocr-base-printed", use_fast=True)
-model = VisionEncoderDecoderModel.from_pretrained("microsoft/trocr-base-printed")
+def load_embedding_model(backend: str = ENCODER_BACKEND, model_name: str = EMBEDDING_MODEL,
+                         threads: int = ONNX_THREADS):
+    """
+    Loads the query encoder selected by ENCODER_BACKEND.
+
+    Args:
+        backend (str): "torch", "onnx" or "onnx-int8".
+        model_name (str): Sentence-transformers model (the
+            ONNX export in ONNX_MODEL_DIR must come from it, or loading fails).
+        threads (int): ONNX Runtime intra-op threads (0 = its default).
+
+    Returns:
+        An object exposing SentenceTransformer-compatible `encode`.
+    """
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    if backend in ("onnx", "onnx-int8"):
+        from onnx_encoder import OnnxEncoder
+        return OnnxEncoder(ONNX_MODEL_DIR, quantized=backend == "onnx-int8",
+                           threads=threads, model_name=model_name)
+    raise ValueError(f"ENCODER_BACKEND inconnu : {backend}")
+
+
+def load_llm():
+    """Builds the Gemini chat client."""
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model="gemini-1.5-pro", temperature=0.5, google_api_key=API_KEY)
+
+
+def load_ocr_model():
+    """Loads the TrOCR processor and model, returned as a pair."""
+    from transformers import TrOCRProcessor, VisionEncoderDecoderModel
+    processor = TrOCRProcessor.from_pretrained("microsoft/trocr-base-printed", use_fast=True)
+    model = VisionEncoderDecoderModel.from_pretrained("microsoft/trocr-base-printed")
+    return processor, model
+
+
+def load_reranker():
+    """Loads the cross-encoder used to re-rank retrieval candidates."""
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(RERANKER_MODEL, device="cpu")
+
+
+def load_name_resolver() -> NameResolver:
+    """Indexes the drug names of ae_med_table for local OCR correction."""
+    from retrieve import get_drug_names
+    return NameResolver(get_drug_names())
+
+
+models = ModelRegistry()
+models.register("embedding", load_embedding_model)
+models.register("llm", load_llm)
+models.register("ocr", load_ocr_model)
+models.register("drug_names", load_name_resolver)
+models.register("reranker", load_reranker)
+
+
+def get_llm():
+    """Gemini client, created on first use."""
+    return models.get("llm")
+
+
+embedding_service = EmbeddingService(
+    lambda texts: models.get("embedding").encode(
+        texts, batch_size=EMBEDDING_MAX_BATCH, normalize_embeddings=True))
+
+# Toutes les paires (question, document) d'une requête en un seul passage
+reranker = Reranker(
+    lambda pairs: models.get("reranker").predict(pairs, batch_size=len(pairs)))
+
+
+def recognize_printed_text(pixel_values: np.ndarray) -> List[str]:
+    """
+    Runs TrOCR on a batch of preprocessed images in one `generate` call.
+
+    Args:
+        pixel_values (np.ndarray): Images of shape (batch, 3, 384, 384).
+
+    Returns:
+        List[str]: Extracted text of each image.
+    """
+    import torch
+    processor, model = models.get("ocr")
+    with torch.no_grad():
+        generated_ids = model.generate(torch.from_numpy(pixel_values))
+    return processor.batch_decode(generated_ids, skip_special_tokens=True)
+
+
+ocr_service = OcrService(recognize_printed_text)
 
 
 def extract_text_from_image(image_path: str) -> str:
@@ -32,22 +123,21 @@ def extract_text_from_image(image_path: str) -> str:
     Returns:
         str: Extracted text from the image.
     """
-    image = Image.open(image_path).convert("RGB")
-    pixel_values = processor(image, return_tensors="pt").pixel_values
-    generated_ids = model.generate(pixel_values)
-    extracted_text = processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
-    
-    return extracted_text
+    with open(image_path, "rb") as image_file:
+        return ocr_service.extract(image_file.read())
 
 
 def generate_embedding(text: str) -> List[float]:
-    """Generate an embedding vector for the given text."""
-    return embedding_model.encode(text, normalize_embeddings=True).tolist()
+    """Generate an embedding vector for the given text (cached, micro-batched)."""
+    return embedding_service.embed(text)
 
 
-def generate_response(question: str, context: str, language: str) -> str:
-    """Generate an enriched response using Gemini AI model."""
-    prompt_template = ChatPromptTemplate.from_template("""
+def generate_embeddings(texts: List[str]) -> List[List[float]]:
+    """Generate embeddings for several texts in one batched forward pass."""
+    return embedding_service.embed_many(texts)
+
+
+RESPONSE_PROMPT = ChatPromptTemplate.from_template("""
     You are a medical AI assistant with expertise in clinical studies.
     Your goal is to provide accurate and structured answers.
 
@@ -55,27 +145,14 @@ def generate_response(question: str, context: str, language: str) -> str:
     - Prioritize medically validated information.
     - If the context is unclear, clarify before answering.
     - Use clear, professional language.
-    - Cite sources if available.
+    - Cite sources if available: the context holds numbered passages [n], cite the numbers you rely on.
 
     **Question:** {question}
     **Context:** {context}
     **Language:** {language}
     """)
 
-    chain = prompt_template | llm
-    response = chain.invoke({
-        "question": question,
-        "context": context,
-        "language": language
-    })
-    return response.content
-
-
-def correct_medication_name(medication_text: str) -> str:
-    """
-    Uses Gemini AI to correct OCR errors in the extracted medication name.
-    """
-    prompt_template = ChatPromptTemplate.from_template("""
+CORRECTION_PROMPT = ChatPromptTemplate.from_template("""
     You are an AI specialized in medication data correction.
     Your task is to correct the name of a medication that may have errors due to OCR mistakes.
 
@@ -88,16 +165,7 @@ def correct_medication_name(medication_text: str) -> str:
     **Extracted Medication Name:** {medication_text}
     """)
 
-    chain = prompt_template | llm
-    response = chain.invoke({"medication_text": medication_text})
-    
-    return response.content.strip()
-
-
-def get_medication_details(medication_name: str, language: str) -> str:
-    """Uses Gemini AI to provide practical information about a medication."""
-    
-    prompt_template = ChatPromptTemplate.from_template("""
+MEDICATION_PROMPT = ChatPromptTemplate.from_template("""
     You are a medical AI assistant with expertise in pharmaceuticals.
     Provide **practical** and **concise** information about the given medication.
 
@@ -112,9 +180,110 @@ def get_medication_details(medication_name: str, language: str) -> str:
     **Language:** {language}
     """)
 
-    chain = prompt_template | llm
+
+TRANSLATION_PROMPT = ChatPromptTemplate.from_template("""
+    Translate the following medication information into {language}.
+
+    **Instructions:**
+    - Keep the Markdown structure and every medical detail.
+    - Do not add, remove or reinterpret information.
+    - Return only the translation.
+
+    **Text:**
+    {text}
+    """)
+
+
+def generate_response(question: str, context: str, language: str) -> str:
+    """Generate an enriched response using Gemini AI model."""
+    chain = RESPONSE_PROMPT | get_llm()
+    response = chain.invoke({
+        "question": question,
+        "context": context,
+        "language": language
+    })
+    return response.content
+
+
+async def agenerate_response(question: str, context: str, language: str) -> str:
+    """Async `generate_response`: awaits Gemini without holding a thread."""
+    chain = RESPONSE_PROMPT | get_llm()
+    response = await chain.ainvoke({
+        "question": question,
+        "context": context,
+        "language": language
+    })
+    return response.content
+
+
+async def astream_response(question: str, context: str, language: str):
+    """Stream the Gemini response to `generate_response` chunk by chunk."""
+    chain = RESPONSE_PROMPT | get_llm()
+    async for chunk in chain.astream({
+        "question": question,
+        "context": context,
+        "language": language
+    }):
+        if chunk.content:
+            yield chunk.content
+
+
+def resolve_medication_name(medication_text: str) -> Resolution:
+    """Closest drug name of ae_med_table; not accepted if the index is unavailable."""
+    try:
+        return models.get("drug_names").resolve(medication_text)
+    except Exception as e:  # pylint: disable=broad-except
+        print(f"Erreur de résolution locale du nom : {e}")
+        return Resolution(None, 0.0, False)
+
+
+def correct_medication_name(medication_text: str) -> str:
+    """
+    Corrects OCR errors in the extracted medication name, from the local
+    drug-name index when it is confident enough, with Gemini AI otherwise.
+    """
+    resolution = resolve_medication_name(medication_text)
+    if resolution.accepted:
+        return resolution.name
+
+    chain = CORRECTION_PROMPT | get_llm()
+    response = chain.invoke({"medication_text": medication_text})
+    
+    return response.content.strip()
+
+
+async def acorrect_medication_name(medication_text: str) -> str:
+    """Async `correct_medication_name`."""
+    if models.is_loaded("drug_names"):
+        resolution = resolve_medication_name(medication_text)
+    else:
+        # Premier appel : chargement des noms depuis PostgreSQL hors de la boucle
+        resolution = await asyncio.to_thread(resolve_medication_name, medication_text)
+    if resolution.accepted:
+        return resolution.name
+
+    chain = CORRECTION_PROMPT | get_llm()
+    response = await chain.ainvoke({"medication_text": medication_text})
+    return response.content.strip()
+
+
+def get_medication_details(medication_name: str, language: str) -> str:
+    """Uses Gemini AI to provide practical information about a medication."""
+    chain = MEDICATION_PROMPT | get_llm()
     response = chain.invoke({"medication_name": medication_name, "language": language})
     
     return response.content
 
 
+async def aget_medication_details(medication_name: str, language: str) -> str:
+    """Async `get_medication_details`."""
+    chain = MEDICATION_PROMPT | get_llm()
+    response = await chain.ainvoke({"medication_name": medication_name, "language": language})
+    return response.content
+
+
+async def atranslate_text(text: str, language: str) -> str:
+    """Uses Gemini AI to translate a rendered answer, keeping its content unchanged."""
+    chain = TRANSLATION_PROMPT | get_llm()
+    response = await chain.ainvoke({"text": text, "language": language})
+    return response.content
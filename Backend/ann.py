@@ -0,0 +1,184 @@
+""" this module provides the search backends used by the vector index:
+    an exact scan over the normalised matrix, and approximate FAISS
+    indexes (IVF-Flat, HNSW) that are persisted to disk between restarts.
+    """
+import hashlib
+import json
+import os
+from typing import Optional, Tuple
+import numpy as np
+from config import (ANN_NLIST, ANN_NPROBE, ANN_HNSW_M,
+                    ANN_EF_CONSTRUCTION, ANN_EF_SEARCH)
+
+ENGINES = ("exact", "ivf", "hnsw")
+
+
+class ExactSearch:
+    """Brute-force inner product over an L2-normalised float32 matrix."""
+
+    engine = "exact"
+
+    def __init__(self, matrix: np.ndarray) -> None:
+        self.matrix = matrix
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the indices and scores of the k best rows, best first."""
+        scores = self.matrix @ query
+        if k < len(scores):
+            indices = np.argpartition(-scores, k - 1)[:k]
+        else:
+            indices = np.arange(len(scores))
+        indices = indices[np.argsort(-scores[indices])]
+        return indices, scores[indices]
+
+    def search_batch(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Search several queries with one matrix-matrix product.
+
+        Returns (n_queries, k) arrays of indices and scores, best first.
+        """
+        scores = queries @ self.matrix.T
+        if k < scores.shape[1]:
+            indices = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            indices = np.tile(np.arange(scores.shape[1]), (len(queries), 1))
+        top_scores = np.take_along_axis(scores, indices, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return (np.take_along_axis(indices, order, axis=1),
+                np.take_along_axis(top_scores, order, axis=1))
+
+    def set_params(self, **_params) -> None:
+        """Exact search has no recall knobs."""
+
+    def extended(self, matrix: np.ndarray, _added: np.ndarray) -> "ExactSearch":
+        """Return a backend over the grown matrix; the current one is left untouched."""
+        return ExactSearch(matrix)
+
+
+class FaissSearch:
+    """Approximate search through a FAISS IVF-Flat or HNSW index."""
+
+    def __init__(self, index, engine: str) -> None:
+        self.index = index
+        self.engine = engine
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the indices and scores of the k best rows, best first."""
+        scores, indices = self.index.search(query.reshape(1, -1), k)
+        found = indices[0] >= 0
+        return indices[0][found].astype(np.int64), scores[0][found]
+
+    def search_batch(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Search several queries in one FAISS call; missing hits have index -1."""
+        scores, indices = self.index.search(np.ascontiguousarray(queries), k)
+        return indices.astype(np.int64), scores
+
+    def set_params(self, nprobe: Optional[int] = None,
+                   ef_search: Optional[int] = None) -> None:
+        """Adjust the recall/latency trade-off without rebuilding the index."""
+        if nprobe is not None and self.engine == "ivf":
+            self.index.nprobe = nprobe
+        if ef_search is not None and self.engine == "hnsw":
+            self.index.hnsw.efSearch = ef_search
+
+    def extended(self, _matrix: np.ndarray, added: np.ndarray) -> "FaissSearch":
+        """Return a copy of the index with `added` appended, without retraining.
+
+        The live index keeps serving queries while the copy is filled.
+        """
+        import faiss  # pylint: disable=import-outside-toplevel
+
+        index = faiss.clone_index(self.index)
+        index.add(np.ascontiguousarray(added))
+        backend = FaissSearch(index, self.engine)
+        backend.set_params(nprobe=getattr(self.index, "nprobe", None),
+                           ef_search=self.index.hnsw.efSearch if self.engine == "hnsw" else None)
+        return backend
+
+
+def build_search(matrix: np.ndarray, engine: str = "exact",
+                 index_path: Optional[str] = None, **params):
+    """Create the search backend for `matrix`.
+
+    FAISS indexes are loaded from `index_path` when a file built from the
+    same matrix exists, otherwise they are trained and written there.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown ANN engine '{engine}', expected one of {ENGINES}")
+    if engine == "exact" or len(matrix) == 0:
+        return ExactSearch(matrix)
+
+    import faiss  # pylint: disable=import-outside-toplevel
+
+    fingerprint = _fingerprint(matrix, engine, params)
+    index = _load_index(faiss, index_path, fingerprint) if index_path else None
+    if index is None:
+        index = _build_index(faiss, matrix, engine, params)
+        if index_path:
+            _save_index(faiss, index, index_path, fingerprint)
+
+    backend = FaissSearch(index, engine)
+    backend.set_params(nprobe=params.get("nprobe", ANN_NPROBE),
+                       ef_search=params.get("ef_search", ANN_EF_SEARCH))
+    return backend
+
+
+def _build_settings(matrix: np.ndarray, engine: str, params: dict) -> dict:
+    """Effective build parameters: explicit `params`, else the ANN_* settings."""
+    if engine == "ivf":
+        nlist = params.get("nlist", ANN_NLIST) or int(np.sqrt(len(matrix)))
+        return {"nlist": max(1, min(nlist, len(matrix)))}
+    return {"m": params.get("m", ANN_HNSW_M),
+            "ef_construction": params.get("ef_construction", ANN_EF_CONSTRUCTION)}
+
+
+def _build_index(faiss, matrix: np.ndarray, engine: str, params: dict):
+    """Train and fill a FAISS index using inner product on normalised vectors."""
+    dim = matrix.shape[1]
+    settings = _build_settings(matrix, engine, params)
+    if engine == "ivf":
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFFlat(quantizer, dim, settings["nlist"],
+                                   faiss.METRIC_INNER_PRODUCT)
+        index.train(matrix)
+    else:
+        index = faiss.IndexHNSWFlat(dim, settings["m"], faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = settings["ef_construction"]
+    index.add(matrix)
+    return index
+
+
+def _fingerprint(matrix: np.ndarray, engine: str, params: dict) -> str:
+    """Identity of the corpus and build settings, used to detect stale files.
+
+    Every vector is hashed, in row order (a FAISS id is a row position), so
+    embeddings rewritten in place or reordered rows never reuse an old file;
+    one pass over the float32 bytes is cheap next to an index build.
+    """
+    digest = hashlib.sha1()
+    digest.update(f"{engine}:{matrix.shape}:{matrix.dtype}".encode("utf-8"))
+    for key, value in sorted(_build_settings(matrix, engine, params).items()):
+        digest.update(f"{key}={value}".encode("utf-8"))
+    digest.update(memoryview(np.ascontiguousarray(matrix)).cast("B"))
+    return digest.hexdigest()
+
+
+def _load_index(faiss, index_path: str, fingerprint: str):
+    """Read a persisted index if it was built from the same corpus."""
+    meta_path = f"{index_path}.json"
+    if not (os.path.exists(index_path) and os.path.exists(meta_path)):
+        return None
+    with open(meta_path, encoding="utf-8") as file:
+        if json.load(file).get("fingerprint") != fingerprint:
+            return None
+    return faiss.read_index(index_path)
+
+
+def _save_index(faiss, index, index_path: str, fingerprint: str) -> None:
+    """Persist the index atomically so concurrent workers never read half a file."""
+    os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, index_path)
+    with open(f"{tmp_path}.json", "w", encoding="utf-8") as file:
+        json.dump({"fingerprint": fingerprint}, file)
+    os.replace(f"{tmp_path}.json", f"{index_path}.json")
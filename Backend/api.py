@@ -2,20 +2,179 @@
     The API has two endpoints: get_sources and answer.
     The answer endpoint also evaluates the quality
     of the generated answer using various metrics """
+import asyncio
+import hmac
+import json
 import time
-import shutil
-import os
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from typing import List, Optional, Tuple
+from fastapi import FastAPI, UploadFile, File, HTTPException, Header
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from agents import (generate_embedding, generate_response,
-                    extract_text_from_image, correct_medication_name,
-                    get_medication_details)
+from agents import (generate_embedding, generate_embeddings, agenerate_response,
+                    astream_response,
+                    acorrect_medication_name, aget_medication_details,
+                    atranslate_text, models, ocr_service, reranker)
 
-from retrieve import find_best_match, find_best_matches_medoc
+from retrieve import (find_top_matches, find_top_matches_batch, find_best_match_medoc,
+                      get_drug_record, qa_corpus, med_corpus)
+from concurrency import ConcurrencyLimit, run_cpu
+from ocr_service import OcrQueueFull
+from medication_answers import MedicationAnswers
+from context_builder import assemble_context
+from response_cache import response_cache
+from db_pool import db_pool
+from metrics import TimingMiddleware, current_timings, metrics, stage
+from config import (ADMIN_TOKEN, MAX_BATCH_SIZE, LLM_BATCH_CONCURRENCY,
+                    SEARCH_CONCURRENCY, LLM_CONCURRENCY, OCR_CONCURRENCY,
+                    WARMUP_MODELS, MAX_IMAGES_PER_REQUEST,
+                    MEDICATION_ANSWER_MODE, MEDICATION_MATCH_THRESHOLD,
+                    CONTEXT_TOP_K, RERANK_CANDIDATES)
 
 
 # Initialize FastAPI
 app = FastAPI()
+# Trace id, histogrammes par endpoint et en-tête Server-Timing
+app.add_middleware(TimingMiddleware)
+
+
+@app.on_event("startup")
+def warm_up_models():
+    """Load WARMUP_MODELS in the background; the server accepts connections meanwhile."""
+    if WARMUP_MODELS:
+        models.warm_up(WARMUP_MODELS)
+
+
+@app.on_event("shutdown")
+def close_db_pool():
+    """Close the pooled database connections of this worker."""
+    db_pool.close()
+
+
+@app.on_event("shutdown")
+def flush_response_cache():
+    """Commit the response cache writes still queued for SQLite."""
+    response_cache.flush()
+
+
+# Limites de requêtes simultanées par endpoint
+limits = {
+    "get_sources": ConcurrencyLimit(SEARCH_CONCURRENCY),
+    "get_medication_info": ConcurrencyLimit(SEARCH_CONCURRENCY),
+    "answer": ConcurrencyLimit(LLM_CONCURRENCY),
+    "answer_medication": ConcurrencyLimit(LLM_CONCURRENCY),
+    "process_medication_image": ConcurrencyLimit(OCR_CONCURRENCY),
+    "process_medication_images": ConcurrencyLimit(OCR_CONCURRENCY),
+}
+# Les endpoints batch partagent la limite de leur équivalent unitaire
+limits["get_sources_batch"] = limits["get_sources"]
+limits["answer_batch"] = limits["answer"]
+
+
+def _rerank_depth(k: int) -> int:
+    """Number of candidates to retrieve for a final top-k."""
+    return max(k, RERANK_CANDIDATES) if RERANK_CANDIDATES else k
+
+
+def _top_documents(question: str, query_embedding: List[float], k: int) -> List[dict]:
+    """Top-k QA documents, re-ranked by the cross-encoder when RERANK_CANDIDATES is set."""
+    with stage("retrieve"):
+        matches = find_top_matches(query_embedding, _rerank_depth(k), query_text=question)
+    if RERANK_CANDIDATES:
+        with stage("rerank"):
+            matches = reranker.rerank(question, matches)
+    return matches[:k]
+
+
+def _top_documents_batch(questions: List[str], query_embeddings: List[List[float]],
+                         k: int) -> List[List[dict]]:
+    """`_top_documents` for several questions; retrieval runs in one pass."""
+    with stage("retrieve"):
+        all_matches = find_top_matches_batch(query_embeddings, _rerank_depth(k), questions)
+    if RERANK_CANDIDATES:
+        with stage("rerank"):
+            all_matches = [reranker.rerank(question, matches)
+                           for question, matches in zip(questions, all_matches)]
+    return [matches[:k] for matches in all_matches]
+
+
+def _source_payload(match: dict) -> dict:
+    """A retrieved row as returned by /get_sources (the question is only used for BM25)."""
+    return {field: value for field, value in match.items() if field != "question"}
+
+
+def _embed_and_match(question: str) -> Tuple[List[float], Optional[dict]]:
+    """CPU-bound part of a QA request, run on the bounded executor."""
+    with stage("embed"):
+        query_embedding = generate_embedding(question)
+    matches = _top_documents(question, query_embedding, 1)
+    return query_embedding, matches[0] if matches else None
+
+
+def _embed_and_retrieve(question: str) -> Tuple[List[float], List[dict]]:
+    """CPU-bound part of an /answer request: the top CONTEXT_TOP_K documents."""
+    with stage("embed"):
+        query_embedding = generate_embedding(question)
+    return query_embedding, _top_documents(question, query_embedding, CONTEXT_TOP_K)
+
+
+def _embed_and_match_medoc(question: str) -> Tuple[List[float], Optional[dict]]:
+    """CPU-bound part of a medication request, run on the bounded executor."""
+    with stage("embed"):
+        query_embedding = generate_embedding(question)
+    with stage("retrieve"):
+        return query_embedding, find_best_match_medoc(query_embedding, question)
+
+
+def _embed_and_match_batch(questions: List[str]) -> Tuple[List[List[float]],
+                                                          List[Optional[dict]]]:
+    """CPU-bound part of a batch request, run on the bounded executor."""
+    with stage("embed"):
+        query_embeddings = generate_embeddings(questions)
+    all_matches = _top_documents_batch(questions, query_embeddings, 1)
+    return query_embeddings, [matches[0] if matches else None for matches in all_matches]
+
+
+def _embed_and_retrieve_batch(questions: List[str]) -> Tuple[List[List[float]],
+                                                             List[List[dict]]]:
+    """CPU-bound part of an /answer_batch request."""
+    with stage("embed"):
+        query_embeddings = generate_embeddings(questions)
+    return query_embeddings, _top_documents_batch(questions, query_embeddings, CONTEXT_TOP_K)
+
+
+# Réponses médicaments rendues depuis ae_med_table, en cache par (médicament, langue)
+medication_answers = MedicationAnswers(get_drug_record, atranslate_text, run_cpu)
+
+
+async def _template_answer(drug: str, language: str) -> Optional[str]:
+    """Answer rendered from the stored record of `drug`, or None to use Gemini."""
+    if MEDICATION_ANSWER_MODE != "template":
+        return None
+    try:
+        return await medication_answers.get(drug, language)
+    except Exception as e:  # pylint: disable=broad-except
+        print(f"Erreur lors de la lecture de la fiche {drug} : {e}")
+        return None
+
+
+async def _medication_details(drug: str, language: str) -> Tuple[str, str]:
+    """Details of a drug and where they come from ("database" or "llm")."""
+    with stage("medication_details"):
+        answer = await _template_answer(drug, language)
+        if answer is not None:
+            return answer, "database"
+        return await aget_medication_details(drug, language), "llm"
+
+
+async def _generate_cached(question: str, context: str, language: str,
+                           query_embedding: List[float]) -> str:
+    """Answer from the response cache, or call Gemini and cache the result."""
+    response = response_cache.get(question, language, context, query_embedding)
+    if response is None:
+        with stage("llm"):
+            response = await agenerate_response(question, context, language)
+        response_cache.put(question, language, context, query_embedding, response)
+    return response
 
 
 # Model for API requests
@@ -30,63 +189,135 @@ la question, la température de la réponse, et la langue. """
 
 # Endpoint to get sources
 @app.post("/get_sources")
-def get_sources(request: QueryRequest):
+async def get_sources(request: QueryRequest):
     """ Récupère les sources correspondant à la question envoyée. 
     Args: request
     (QueryRequest): La requête contenant la question, la température et la langue. 
     Returns: dict: Le meilleur match des sources. """
-    start_time = time.time()
-    query_embedding = generate_embedding(request.question)
-    best_match = find_best_match(query_embedding)
+    start_time = time.perf_counter()
+    async with limits["get_sources"]:
+        _, best_match = await run_cpu(_embed_and_match, request.question)
 
     if best_match:
-        response_time = time.time() - start_time
+        response_time = time.perf_counter() - start_time
         print(f"Response time for get_sources: {response_time:.4f} seconds")
-        return best_match
+        return _source_payload(best_match)
 
-    response_time = time.time() - start_time
+    response_time = time.perf_counter() - start_time
     print(f"Response time for get_sources: {response_time:.4f} seconds")
     raise HTTPException(status_code=404, detail="No relevant document found.")
 
 
 # Endpoint to generate an enriched answer with Gemini
 @app.post("/answer")
-def answer(request: QueryRequest):
-    start_time = time.time()
-    query_embedding = generate_embedding(request.question)
-    best_match = find_best_match(query_embedding)
+async def answer(request: QueryRequest):
+    start_time = time.perf_counter()
+    async with limits["answer"]:
+        query_embedding, matches = await run_cpu(_embed_and_retrieve, request.question)
+        return await _answer_from_matches(
+            request.question, matches, request.language, start_time, query_embedding)
 
-    if not best_match:
-        response_time = time.time() - start_time
+
+async def _answer_from_matches(question: str, matches: List[dict],
+                               language: str, start_time: float,
+                               query_embedding: List[float]) -> dict:
+    """Generate the /answer payload for a question and its retrieved documents.
+
+    `source`, `focus_area` and `similarity` describe the best match;
+    `sources` lists every document packed into the prompt context.
+    """
+    if not matches:
+        response_time = time.perf_counter() - start_time
         print(
             f"No match found: {response_time:.4f} s")
         return {"message": """I couldn't find relevant information.
                 Answering based on general knowledge."""}
 
-    response = generate_response(
-        request.question, best_match['answer'], request.language)
-                response, metrics, response_time)
+    best_match = matches[0]
+    context, sources = assemble_context(matches)
+    response = await _generate_cached(question, context, language, query_embedding)
+    response_time = time.perf_counter() - start_time
 
     return {
         "answer": response,
         "source": best_match["source"],
         "focus_area": best_match["focus_area"],
         "similarity": best_match["similarity"],
-   
+        "sources": sources,
+
         "response_time": round(response_time, 4)
     }
 
 
+class BatchQueryRequest(BaseModel):
+    """ Plusieurs questions traitées en un seul appel : un seul passage
+    d'encodage, une seule recherche, et les appels Gemini en parallèle. """
+    questions: List[str]
+    temperature: float = 0.7
+    language: str = "english"
+
+
+def _check_batch_size(request: BatchQueryRequest) -> None:
+    if len(request.questions) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {MAX_BATCH_SIZE} questions per batch.")
+
+
+# Endpoints batch : une réponse par question, au format des endpoints unitaires
+@app.post("/get_sources_batch")
+async def get_sources_batch(request: BatchQueryRequest):
+    """ Récupère les sources de plusieurs questions. Les questions sans
+    document pertinent renvoient {"detail": "No relevant document found."}. """
+    _check_batch_size(request)
+    if not request.questions:
+        return []
+    start_time = time.perf_counter()
+    async with limits["get_sources_batch"]:
+        _, best_matches = await run_cpu(_embed_and_match_batch, request.questions)
+
+    response_time = time.perf_counter() - start_time
+    print(f"Response time for get_sources_batch ({len(request.questions)} questions): "
+          f"{response_time:.4f} seconds")
+    return [_source_payload(match) if match else {"detail": "No relevant document found."}
+            for match in best_matches]
+
+
+@app.post("/answer_batch")
+async def answer_batch(request: BatchQueryRequest):
+    """ Génère les réponses de plusieurs questions, avec les appels Gemini
+    exécutés en parallèle (au plus LLM_BATCH_CONCURRENCY à la fois). """
+    _check_batch_size(request)
+    if not request.questions:
+        return []
+    start_time = time.perf_counter()
+    async with limits["answer_batch"]:
+        query_embeddings, all_matches = await run_cpu(
+            _embed_and_retrieve_batch, request.questions)
+
+        batch_limit = asyncio.Semaphore(LLM_BATCH_CONCURRENCY)
+
+        async def answer_one(question: str, matches: List[dict],
+                             query_embedding: List[float]) -> dict:
+            async with batch_limit:
+                return await _answer_from_matches(
+                    question, matches, request.language, start_time, query_embedding)
+
+        return await asyncio.gather(*(
+            answer_one(question, matches, query_embedding)
+            for question, matches, query_embedding
+            in zip(request.questions, all_matches, query_embeddings)))
+
+
 # Endpoint pour rechercher un médicament
 @app.post("/get_medication_info")
-def get_medication_info(request: QueryRequest):
-    start_time = time.time()
-    query_embedding = generate_embedding(request.question)
-    # Utilisation de la nouvelle fonction
-    best_match = find_best_matches_medoc(query_embedding)
+async def get_medication_info(request: QueryRequest):
+    start_time = time.perf_counter()
+    async with limits["get_medication_info"]:
+        _, best_match = await run_cpu(_embed_and_match_medoc, request.question)
 
     if best_match:
-        response_time = time.time() - start_time
+        response_time = time.perf_counter() - start_time
         print(
             f"Response time for get_medication_info: {response_time:.4f} seconds")
         return {
@@ -94,11 +325,12 @@ def get_medication_info(request: QueryRequest):
             "indication": best_match["indication"],
             "side_effects": best_match["side_effects"],
             "drug_interaction": best_match["drug_interaction"],
+            "dosage": best_match["dosage"],
             "similarity": best_match["similarity"],
             "response_time": round(response_time, 4)
         }
 
-    response_time = time.time() - start_time
+    response_time = time.perf_counter() - start_time
     print(
         f"Response time for get_medication_info: {response_time:.4f} seconds")
     raise HTTPException(
@@ -108,59 +340,274 @@ def get_medication_info(request: QueryRequest):
 
 
 @app.post("/answer_medication")
-def answer_medication(request: QueryRequest):
-    start_time = time.time()
-    query_embedding = generate_embedding(request.question)
-    best_match = find_best_matches_medoc(query_embedding)
+async def answer_medication(request: QueryRequest):
+    async with limits["answer_medication"]:
+        return await _answer_medication(request)
+
+
+async def _answer_medication(request: QueryRequest):
+    start_time = time.perf_counter()
+    query_embedding, best_match = await run_cpu(_embed_and_match_medoc, request.question)
 
     if not best_match:
-        response_time = time.time() - start_time
+        response_time = time.perf_counter() - start_time
         print(f"No match found: {response_time:.4f} s")
         return {"message": "I couldn't find relevant medication information. Answering based on general knowledge."}
 
-    response = generate_response(
-        request.question, best_match['drug'], request.language)
+    # Médicament identifié avec confiance : réponse depuis la fiche, sans Gemini
+    if best_match["similarity"] >= MEDICATION_MATCH_THRESHOLD:
+        answer = await _template_answer(best_match["drug"], request.language)
+        if answer is not None:
+            return {
+                "answer": answer,
+                "answer_source": "database",
+                "drug": best_match["drug"],
+                "indication": best_match["indication"],
+                "side_effects": best_match["side_effects"],
+                "drug_interaction": best_match["drug_interaction"],
+                "similarity": best_match["similarity"],
+                "response_time": round(time.perf_counter() - start_time, 4)
+            }
+
+    response = await _generate_cached(
+        request.question, best_match['drug'], request.language, query_embedding)
+    response_time = time.perf_counter() - start_time
 
-    
     return {
         "answer": response,
+        "answer_source": "llm",
         "drug": best_match["drug"],
         "indication": best_match["indication"],
         "side_effects": best_match["side_effects"],
         "drug_interaction": best_match["drug_interaction"],
         "similarity": best_match["similarity"],
-      
+
         "response_time": round(response_time, 4)
     }
 
+# Endpoints en streaming (Server-Sent Events) : métadonnées de recherche
+# immédiatement, puis les tokens de Gemini au fil de la génération
+def _sse(event: str, data) -> str:
+    """Format one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _prepare_answer(question: str) -> Tuple[List[float], Optional[dict], Optional[str]]:
+    """Embedding, metadata event and prompt context of an /answer_stream request."""
+    query_embedding, matches = _embed_and_retrieve(question)
+    if not matches:
+        return query_embedding, None, None
+    context, sources = assemble_context(matches)
+    metadata = {field: matches[0][field] for field in ("source", "focus_area", "similarity")}
+    return query_embedding, {**metadata, "sources": sources}, context
+
+
+def _prepare_medication_answer(question: str) -> Tuple[List[float], Optional[dict],
+                                                        Optional[str]]:
+    """Embedding, metadata event and prompt context of an /answer_medication_stream request."""
+    query_embedding, best_match = _embed_and_match_medoc(question)
+    if not best_match:
+        return query_embedding, None, None
+    metadata = {field: best_match[field] for field in
+                ("drug", "indication", "side_effects", "drug_interaction", "similarity")}
+    return query_embedding, metadata, best_match["drug"]
+
+
+async def _stream_answer(question: str, language: str, limit: ConcurrencyLimit,
+                         prepare, no_match_message: str):
+    """Event stream shared by /answer_stream and /answer_medication_stream.
+
+    `prepare(question)` runs on the CPU executor and returns the query
+    embedding, the metadata to send (None when nothing was found) and the
+    prompt context. Events: `metadata` (retrieved documents), `token`
+    ({"text": ...}) for each chunk, `message` when nothing relevant was
+    found, `error`, and a final `done` carrying the total response time.
+    """
+    start_time = time.perf_counter()
+    try:
+        async with limit:
+            query_embedding, metadata, context = await run_cpu(prepare, question)
+            if metadata is None:
+                yield _sse("message", {"message": no_match_message})
+            else:
+                yield _sse("metadata", metadata)
+                cached = response_cache.get(question, language, context, query_embedding)
+                if cached is not None:
+                    yield _sse("token", {"text": cached})
+                else:
+                    tokens = []
+                    with stage("llm"):
+                        async for token in astream_response(question, context, language):
+                            tokens.append(token)
+                            yield _sse("token", {"text": token})
+                    response_cache.put(question, language, context,
+                                       query_embedding, "".join(tokens))
+    except HTTPException as e:
+        yield _sse("error", {"detail": e.detail})
+    except Exception as e:  # pylint: disable=broad-except
+        yield _sse("error", {"detail": str(e)})
+    yield _sse("done", {"response_time": round(time.perf_counter() - start_time, 4),
+                        "timings_ms": current_timings()})
+
+
+@app.post("/answer_stream")
+async def answer_stream(request: QueryRequest):
+    """ Variante en streaming de /answer. """
+    return StreamingResponse(_stream_answer(
+        request.question, request.language, limits["answer"], _prepare_answer,
+        "I couldn't find relevant information. Answering based on general knowledge."),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.post("/answer_medication_stream")
+async def answer_medication_stream(request: QueryRequest):
+    """ Variante en streaming de /answer_medication. """
+    return StreamingResponse(_stream_answer(
+        request.question, request.language, limits["answer_medication"],
+        _prepare_medication_answer,
+        "I couldn't find relevant medication information. Answering based on general knowledge."),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 # Endpoint pour traiter une image de médicament
 
 
+async def _read_medication_text(data: bytes) -> Tuple[str, str]:
+    """OCR an encoded image, then correct the medication name it contains."""
+    try:
+        with stage("ocr"):
+            extracted_text = await ocr_service.aextract(data)
+    except OcrQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e)) from e
+    with stage("name_correction"):
+        corrected_name = await acorrect_medication_name(extracted_text)
+    return extracted_text, corrected_name
+
+
 @app.post("/process_medication_image")
 async def process_medication(image: UploadFile = File(...)):
     """
     Reçoit une image de médicament, extrait et corrige le texte,
     puis retourne les détails du médicament.
     """
-    # Sauvegarde temporaire de l'image
-    temp_image_path = f"temp_{image.filename}"
-    with open(temp_image_path, "wb") as buffer:
-        shutil.copyfileobj(image.file, buffer)
-
     try:
-        extracted_text = extract_text_from_image(temp_image_path)
-        print(extracted_text)
-        corrected_name = correct_medication_name(extracted_text)
-        medication_info = get_medication_details(corrected_name, "English")
-
-        # Nettoyage du fichier temporaire
-        os.remove(temp_image_path)
+        data = await image.read()
+        async with limits["process_medication_image"]:
+            extracted_text, corrected_name = await _read_medication_text(data)
+            print(extracted_text)
+            medication_info, info_source = await _medication_details(corrected_name, "English")
 
         return {
             "status": "success",
             "corrected_name": corrected_name,
-            "medication_info": medication_info
+            "medication_info": medication_info,
+            "info_source": info_source
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         return {"status": "error", "message": str(e)}
+
+
+# Plusieurs photos d'un même lot (faces d'un emballage, plusieurs boîtes) :
+# l'OCR des images est groupé et chaque médicament distinct n'est décrit qu'une fois
+@app.post("/process_medication_images")
+async def process_medication_images(images: List[UploadFile] = File(...)):
+    """
+    Reçoit plusieurs images de médicaments, extrait et corrige le texte de
+    chacune, puis retourne les détails de chaque médicament distinct.
+    """
+    if len(images) > MAX_IMAGES_PER_REQUEST:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {MAX_IMAGES_PER_REQUEST} images per request.")
+
+    async with limits["process_medication_images"]:
+        contents = [await image.read() for image in images]
+        readings = await asyncio.gather(
+            *(_read_medication_text(data) for data in contents), return_exceptions=True)
+        if any(isinstance(reading, HTTPException) for reading in readings):
+            raise next(r for r in readings if isinstance(r, HTTPException))
+
+        names = list(dict.fromkeys(
+            reading[1] for reading in readings if not isinstance(reading, BaseException)))
+        details = await asyncio.gather(
+            *(_medication_details(name, "English") for name in names),
+            return_exceptions=True)
+
+    results = []
+    for image, reading in zip(images, readings):
+        if isinstance(reading, BaseException):
+            results.append({"filename": image.filename, "status": "error",
+                            "message": str(reading)})
+        else:
+            results.append({"filename": image.filename, "status": "success",
+                            "extracted_text": reading[0], "corrected_name": reading[1]})
+    medications = [
+        {"corrected_name": name, "status": "error", "message": str(info)}
+        if isinstance(info, BaseException) else
+        {"corrected_name": name, "status": "success",
+         "medication_info": info[0], "info_source": info[1]}
+        for name, info in zip(names, details)
+    ]
+    return {"images": results, "medications": medications}
+
+
+# Readiness : 200 une fois les modèles de WARMUP_MODELS chargés, 503 avant
+@app.get("/ready")
+def ready():
+    """Report which models are loaded and whether the replica can take traffic."""
+    is_ready = all(models.is_loaded(name) for name in WARMUP_MODELS)
+    return JSONResponse(status_code=200 if is_ready else 503,
+                        content={"ready": is_ready, "models": models.status()})
+
+
+def _check_admin_token(x_admin_token: Optional[str]) -> None:
+    """403 unless ADMIN_TOKEN is set and matches; /admin/* is closed without a token."""
+    if not ADMIN_TOKEN or not hmac.compare_digest(
+            (x_admin_token or "").encode("utf-8"), ADMIN_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+
+# Endpoint d'administration : rechargement forcé du corpus en mémoire
+@app.post("/admin/reload")
+def admin_reload(full: bool = True, corpus: str = "qa",
+                 x_admin_token: Optional[str] = Header(None)):
+    """Reload an in-memory corpus ("qa" or "med") in the background.
+
+    `full=false` only appends rows added since the last load. Requests keep
+    being served from the current index until the reload completes.
+    """
+    _check_admin_token(x_admin_token)
+    corpora = {"qa": qa_corpus, "med": med_corpus}
+    if corpus not in corpora:
+        raise HTTPException(status_code=422, detail=f"Unknown corpus: {corpus}")
+    started = corpora[corpus].refresh_in_background(full=full)
+    return {"status": "reloading" if started else "already_refreshing",
+            **corpora[corpus].status()}
+
+
+@app.get("/admin/cache")
+def admin_cache(x_admin_token: Optional[str] = Header(None)):
+    """Hit/miss counters of the response cache."""
+    _check_admin_token(x_admin_token)
+    return response_cache.snapshot_stats()
+
+
+@app.get("/admin/db")
+def admin_db(x_admin_token: Optional[str] = Header(None)):
+    """Connection pool usage of this worker (size DB_POOL_MAX from peak_in_use and waits)."""
+    _check_admin_token(x_admin_token)
+    return db_pool.stats()
+
+
+# Latences par endpoint et par étape, au format Prometheus
+@app.get("/metrics")
+def get_metrics(format: str = "prometheus"):  # pylint: disable=redefined-builtin
+    """Latency histograms of this worker; `format=json` gives count, mean and p50/p95/p99 in ms."""
+    if format == "json":
+        return metrics.summary()
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
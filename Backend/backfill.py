@@ -0,0 +1,271 @@
+""" this module computes the missing embeddings of the QA and medication
+    tables.
+
+    Rows without embedding are streamed by id with a server-side cursor,
+    encoded in real batches (one forward pass per batch, optionally spread
+    over several processes) and written back with one bulk UPDATE per batch.
+    The last committed id is checkpointed after every batch, so an
+    interrupted run resumes where it stopped. The binary (`<column>_f32`)
+    and pgvector (`<column>_vec`) copies are filled too when they exist.
+
+    The target is the column of the model version given by --model/--dim
+    (EMBEDDING_MODEL by default, see `embedding_versions`); a new version
+    is registered as a shadow column and marked ready once complete. With
+    --all-versions, every registered version of the table is filled in turn,
+    e.g. after an ingest during a migration (needs a backend able to load
+    each model, i.e. torch).
+
+    Usage (from the Backend directory):
+        python backfill.py qa --batch-size 256
+        python backfill.py med --workers 4
+        python backfill.py qa --model BAAI/bge-small-en-v1.5 --dim 384
+        python backfill.py qa --all-versions
+    """
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from psycopg2.extras import execute_values
+from config import ENCODER_BACKEND, EMBEDDING_MODEL, EMBEDDING_DIM
+from retrieve import connect_db, TABLE_NAME, MED_TABLE
+from embedding_store import to_binary
+from embedding_versions import (LEGACY_COLUMN, binary_column, vector_column, column_name,
+                                list_versions, start_shadow, mark_ready)
+from pgvector_store import to_vector_literal
+
+BATCH_SIZE = 256
+CHECKPOINT_DIR = "checkpoints"
+# Texte encodé pour chaque table
+CORPORA = {
+    "qa": (TABLE_NAME, "question"),
+    "med": (MED_TABLE, "drug"),
+}
+
+_model = None  # encodeur du processus courant (chargé à la première utilisation)
+
+
+def _init_worker(backend: str, model_name: str, threads: int) -> None:
+    global _model  # pylint: disable=global-statement
+    # Chaque processus n'utilise que sa part des cœurs
+    if backend == "torch":
+        import torch  # pylint: disable=import-outside-toplevel
+        torch.set_num_threads(threads)
+    from agents import load_embedding_model  # pylint: disable=import-outside-toplevel
+    _model = load_embedding_model(backend, model_name, threads=threads)
+
+
+def encode_batch(texts: List[str], backend: str = ENCODER_BACKEND,
+                 model_name: str = EMBEDDING_MODEL) -> np.ndarray:
+    """Encode `texts` in one batched call of the current process' encoder."""
+    global _model  # pylint: disable=global-statement
+    if _model is None:
+        from agents import load_embedding_model  # pylint: disable=import-outside-toplevel
+        _model = load_embedding_model(backend, model_name)
+    return np.asarray(_model.encode(texts, batch_size=len(texts)), dtype=np.float32)
+
+
+class Checkpoint:
+    """Last committed id of a table column, persisted as JSON and replaced atomically."""
+
+    def __init__(self, table: str, directory: str = CHECKPOINT_DIR,
+                 column: str = LEGACY_COLUMN) -> None:
+        suffix = "" if column == LEGACY_COLUMN else f"_{column}"
+        self.path = os.path.join(directory, f"backfill_{table}{suffix}.json")
+        self.last_id, self.done = -1, 0
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as file:
+                state = json.load(file)
+            self.last_id, self.done = state["last_id"], state["done"]
+
+    def save(self, last_id: int, count: int) -> None:
+        """Record that every row up to `last_id` has been processed."""
+        self.last_id, self.done = last_id, self.done + count
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(f"{self.path}.tmp", "w", encoding="utf-8") as file:
+            json.dump({"last_id": self.last_id, "done": self.done}, file)
+        os.replace(f"{self.path}.tmp", self.path)
+
+    def reset(self) -> None:
+        """Forget the progress (next run starts from the first id)."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.last_id, self.done = -1, 0
+
+
+def stream_batches(conn, table: str, text_column: str, after_id: int, batch_size: int,
+                   column: str = LEGACY_COLUMN) -> Iterator[List[Tuple[int, Optional[str]]]]:
+    """Yield (id, text) batches of rows without embedding in `column`, by increasing id.
+
+    A named cursor keeps the result set on the server: only `batch_size`
+    rows are in memory at a time.
+    """
+    with conn.cursor(name=f"backfill_{table}") as cur:
+        cur.itersize = batch_size
+        cur.execute(f"""SELECT id, {text_column} FROM {table}
+                    WHERE {column} IS NULL AND id > %s ORDER BY id""", (after_id,))
+        while True:
+            batch = cur.fetchmany(batch_size)
+            if not batch:
+                break
+            yield batch
+    conn.rollback()
+
+
+def _column_types(conn, table: str) -> Dict[str, str]:
+    with conn.cursor() as cur:
+        cur.execute("""SELECT column_name, udt_name FROM information_schema.columns
+                    WHERE table_name = %s""", (table,))
+        columns = dict(cur.fetchall())
+    conn.rollback()
+    return columns
+
+
+def write_embeddings(conn, table: str, ids: Sequence[int], embeddings: np.ndarray,
+                     columns: Dict[str, str], column: str = LEGACY_COLUMN) -> None:
+    """Store one batch of embeddings with a single UPDATE ... FROM (VALUES ...).
+
+    `columns` maps the table's columns to their type: the JSON text is cast
+    for json/jsonb columns, and the optional binary/vector copies of
+    `column` are set only if present.
+    """
+    binary, vector = binary_column(column), vector_column(column)
+    json_type = columns.get(column)
+    cast = f"::{json_type}" if json_type in ("json", "jsonb") else ""
+    fields, casts = [column], [f"v.{column}{cast}"]
+    if binary in columns:
+        fields.append(binary)
+        casts.append(f"v.{binary}")
+    if vector in columns:
+        fields.append(vector)
+        casts.append(f"v.{vector}::vector")
+
+    values = []
+    for row_id, embedding in zip(ids, embeddings):
+        row = [row_id, json.dumps(embedding.tolist())]
+        if binary in columns:
+            row.append(to_binary(embedding))
+        if vector in columns:
+            row.append(to_vector_literal(embedding))
+        values.append(tuple(row))
+
+    assignments = ", ".join(f"{field} = {cast}" for field, cast in zip(fields, casts))
+    with conn.cursor() as cur:
+        execute_values(
+            cur,
+            f"""UPDATE {table} AS t SET {assignments}
+            FROM (VALUES %s) AS v (id, {", ".join(fields)}) WHERE t.id = v.id""",
+            values, page_size=len(values))
+    conn.commit()
+
+
+def backfill(corpus: str = "qa", batch_size: int = BATCH_SIZE, workers: int = 0,
+             backend: str = ENCODER_BACKEND, checkpoint_dir: str = CHECKPOINT_DIR,
+             model_name: str = EMBEDDING_MODEL, dim: int = EMBEDDING_DIM) -> dict:
+    """Embed every row of `corpus` that has no embedding yet for `model_name`.
+
+    With `workers` > 1, batches are encoded by that many processes (each
+    with its share of the CPU threads) while the main process reads and
+    writes; at most 2 * workers batches are in flight.
+    """
+    table, text_column = CORPORA[corpus]
+    # Curseur serveur et écritures sur deux connexions : un commit fermerait le curseur
+    reader, writer = connect_db(), connect_db()
+    version = start_shadow(writer, table, model_name, dim)
+    columns = _column_types(writer, table)
+    checkpoint = Checkpoint(table, checkpoint_dir, version.column)
+    if checkpoint.last_id >= 0:
+        print(f"{table}: reprise après l'id {checkpoint.last_id} ({checkpoint.done} déjà traités)")
+    executor = None
+    if workers > 1:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                                       initializer=_init_worker,
+                                       initargs=(backend, model_name, threads))
+
+    stats = {"embedded": 0, "skipped": 0}
+    start_time = time.perf_counter()
+
+    def store(last_id: int, ids: List[int], embeddings: np.ndarray, skipped: int) -> None:
+        if ids:
+            if embeddings.shape[1] != version.dim:
+                raise ValueError(f"{model_name} produit des vecteurs de dimension "
+                                 f"{embeddings.shape[1]}, {version.dim} attendue")
+            write_embeddings(writer, table, ids, embeddings, columns, version.column)
+        checkpoint.save(last_id, len(ids))
+        stats["embedded"] += len(ids)
+        stats["skipped"] += skipped
+        elapsed = time.perf_counter() - start_time
+        print(f"{table}: {stats['embedded']} embeddings écrits "
+              f"({stats['embedded'] / elapsed:.0f} lignes/s)")
+
+    pending = deque()
+    try:
+        for batch in stream_batches(reader, table, text_column, checkpoint.last_id, batch_size,
+                                    version.column):
+            rows = [(row_id, text) for row_id, text in batch if text and str(text).strip()]
+            ids, texts = [row[0] for row in rows], [str(row[1]) for row in rows]
+            skipped, last_id = len(batch) - len(rows), batch[-1][0]
+            if executor is None:
+                store(last_id, ids,
+                      encode_batch(texts, backend, model_name) if texts else None, skipped)
+                continue
+            future = executor.submit(encode_batch, texts, backend, model_name) if texts else None
+            pending.append((last_id, ids, future, skipped))
+            # Écriture dans l'ordre des ids pour que le checkpoint reste monotone
+            while len(pending) >= 2 * workers or (pending and pending[0][2] is None):
+                last_id, ids, future, skipped = pending.popleft()
+                store(last_id, ids, future.result() if future else None, skipped)
+        while pending:
+            last_id, ids, future, skipped = pending.popleft()
+            store(last_id, ids, future.result() if future else None, skipped)
+        stats["servable"] = mark_ready(writer, table, version, text_column)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        reader.close()
+        writer.close()
+
+    stats["seconds"] = round(time.perf_counter() - start_time, 2)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute the missing embeddings.")
+    parser.add_argument("corpus", nargs="?", choices=tuple(CORPORA), default="qa")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=0,
+                        help="encoding processes (0 or 1 = in the main process)")
+    parser.add_argument("--backend", default=ENCODER_BACKEND,
+                        choices=("torch", "onnx", "onnx-int8"))
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--dim", type=int, default=EMBEDDING_DIM)
+    parser.add_argument("--all-versions", action="store_true",
+                        help="fill every registered version instead of --model/--dim")
+    parser.add_argument("--checkpoint-dir", default=CHECKPOINT_DIR)
+    parser.add_argument("--restart", action="store_true",
+                        help="ignore the saved checkpoint")
+    args = parser.parse_args()
+
+    targets = [(args.model, args.dim)]
+    if args.all_versions:
+        connection = connect_db()
+        try:
+            targets = [(v.model, v.dim) for v in list_versions(connection, CORPORA[args.corpus][0])]
+        finally:
+            connection.close()
+    for target_model, target_dim in targets:
+        if args.restart:
+            Checkpoint(CORPORA[args.corpus][0], args.checkpoint_dir,
+                       column_name(target_model, target_dim)).reset()
+        result = backfill(args.corpus, args.batch_size, args.workers, args.backend,
+                          args.checkpoint_dir, target_model, target_dim)
+        rate = result["embedded"] / result["seconds"] if result["seconds"] else 0.0
+        print(f"{target_model}@{target_dim} terminé : {result['embedded']} embeddings, "
+              f"{result['skipped']} lignes sans texte, {result['seconds']} s ({rate:.0f} lignes/s)")
+        if not result["servable"]:
+            print(f"{target_model}@{target_dim} n'est pas encore complet : relancer le backfill")
@@ -0,0 +1,53 @@
+""" this module holds the asyncio helpers of the API: a bounded executor
+    for CPU-bound work (embedding, similarity search, OCR) and per-endpoint
+    concurrency limits, so LLM calls can wait on the event loop instead of
+    occupying a thread each.
+    """
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from config import CPU_WORKERS, QUEUE_TIMEOUT_SECONDS
+
+cpu_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu")
+
+
+async def run_cpu(func, *args, **kwargs):
+    """Run a blocking function on the bounded CPU executor and await its result.
+
+    The caller's context is copied into the thread, so stages timed there
+    count in the request's latency breakdown.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        cpu_executor, functools.partial(context.run, func, *args, **kwargs))
+
+
+class ConcurrencyLimit:
+    """Caps the number of in-flight requests of an endpoint.
+
+    Requests above the limit wait for a slot for at most `timeout` seconds,
+    then get a 503 instead of piling up without bound.
+    """
+
+    def __init__(self, limit: int, timeout: float = QUEUE_TIMEOUT_SECONDS) -> None:
+        self.limit = limit
+        self.timeout = timeout
+        self._semaphore = None
+
+    async def __aenter__(self) -> "ConcurrencyLimit":
+        # Créé à la première requête, dans la boucle d'événements du serveur
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+        except asyncio.TimeoutError as e:
+            raise HTTPException(
+                status_code=503, detail="Server busy, please retry later.") from e
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._semaphore.release()
+
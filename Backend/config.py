@@ -13,3 +13,107 @@ REGION = os.getenv("REGION")
 TABLE_NAME = os.getenv("TABLE_NAME")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 API_KEY = os.getenv("GOOGLE_API_KEY")
+
+# Recherche vectorielle : "exact", "ivf" (FAISS IVF-Flat) ou "hnsw" (FAISS HNSW)
+ANN_ENGINE = os.getenv("ANN_ENGINE", "exact")
+ANN_NLIST = int(os.getenv("ANN_NLIST", "0"))  # 0 = sqrt(taille du corpus)
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "8"))
+ANN_HNSW_M = int(os.getenv("ANN_HNSW_M", "32"))
+ANN_EF_CONSTRUCTION = int(os.getenv("ANN_EF_CONSTRUCTION", "200"))
+ANN_EF_SEARCH = int(os.getenv("ANN_EF_SEARCH", "64"))
+ANN_INDEX_DIR = os.getenv("ANN_INDEX_DIR", "indexes")
+
+# "memory" : index vectoriel en mémoire dans chaque worker
+# "database" : recherche pgvector côté PostgreSQL (ORDER BY embedding <=> ...)
+SEARCH_MODE = os.getenv("SEARCH_MODE", "memory")
+PGVECTOR_INDEX = os.getenv("PGVECTOR_INDEX", "hnsw")  # hnsw ou ivfflat
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "768"))
+# Modèle des embeddings de requête : seule la colonne de ce modèle est interrogée
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-mpnet-base-v2")
+
+# Format de stockage des embeddings : "json" (texte) ou "f32" (bytea float32)
+EMBEDDING_FORMAT = os.getenv("EMBEDDING_FORMAT", "json")
+
+# Snapshots mémoire-mappés partagés entre workers (vide = désactivé)
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "")
+SNAPSHOT_POLL_SECONDS = float(os.getenv("SNAPSHOT_POLL_SECONDS", "30"))
+
+# Rafraîchissement en arrière-plan de l'index en mémoire (0 = jamais)
+CORPUS_REFRESH_SECONDS = float(os.getenv("CORPUS_REFRESH_SECONDS", "300"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")  # requis par /admin/* (non défini = fermés)
+
+# Endpoints batch
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "64"))
+LLM_BATCH_CONCURRENCY = int(os.getenv("LLM_BATCH_CONCURRENCY", "8"))
+
+# Pipeline asynchrone : exécuteur CPU borné et requêtes simultanées par endpoint
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(min(8, os.cpu_count() or 1))))
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", "64"))
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "256"))
+OCR_CONCURRENCY = int(os.getenv("OCR_CONCURRENCY", "8"))
+QUEUE_TIMEOUT_SECONDS = float(os.getenv("QUEUE_TIMEOUT_SECONDS", "30"))
+
+# Cache des réponses générées (taille 0 = désactivé, base SQLite optionnelle)
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1000"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "86400"))
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.95"))
+RESPONSE_CACHE_DB = os.getenv("RESPONSE_CACHE_DB", "")
+
+# Service d'embedding : cache LRU et micro-batching des requêtes concurrentes
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "32"))
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))
+
+# Encodeur des requêtes : "torch" (SentenceTransformer), "onnx" ou "onnx-int8"
+ENCODER_BACKEND = os.getenv("ENCODER_BACKEND", "torch")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "models/all-mpnet-base-v2-onnx")
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))  # 0 = valeur par défaut d'ONNX Runtime
+
+# Modèles chargés en arrière-plan au démarrage de l'API (les autres au premier appel)
+WARMUP_MODELS = [name for name in os.getenv("WARMUP_MODELS", "embedding,llm").split(",") if name]
+
+# Pipeline OCR : prétraitement en processus, batching des images, file bornée
+OCR_PREPROCESS_WORKERS = int(os.getenv("OCR_PREPROCESS_WORKERS", "2"))  # 0 = thread
+OCR_MAX_BATCH = int(os.getenv("OCR_MAX_BATCH", "8"))
+OCR_BATCH_WAIT_MS = float(os.getenv("OCR_BATCH_WAIT_MS", "20"))
+OCR_QUEUE_SIZE = int(os.getenv("OCR_QUEUE_SIZE", "64"))
+MAX_IMAGES_PER_REQUEST = int(os.getenv("MAX_IMAGES_PER_REQUEST", "16"))
+
+# Résolution locale des noms de médicaments lus par OCR (en dessous : correction Gemini)
+NAME_RESOLVER_THRESHOLD = float(os.getenv("NAME_RESOLVER_THRESHOLD", "0.85"))
+
+# Réponses médicaments : "template" (champs de ae_med_table) ou "llm" (Gemini)
+MEDICATION_ANSWER_MODE = os.getenv("MEDICATION_ANSWER_MODE", "template")
+MEDICATION_MATCH_THRESHOLD = float(os.getenv("MEDICATION_MATCH_THRESHOLD", "0.7"))
+MEDICATION_CACHE_SIZE = int(os.getenv("MEDICATION_CACHE_SIZE", "1000"))
+
+# Mode de recherche : "dense" (embeddings), "lexical" (BM25) ou "hybrid" (fusion RRF)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "dense")
+RRF_K = int(os.getenv("RRF_K", "60"))
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "50"))
+# Part du poids IDF de la requête qu'un document doit couvrir pour passer sans le seuil cosinus
+HYBRID_MIN_BM25_RATIO = float(os.getenv("HYBRID_MIN_BM25_RATIO", "0.5"))
+
+# Contexte du prompt : top-k documents dédupliqués dans un budget de tokens
+CONTEXT_TOP_K = int(os.getenv("CONTEXT_TOP_K", "5"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))
+
+# Re-ranking cross-encoder des N meilleurs candidats (0 = désactivé)
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "0"))
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))  # 0 = sans limite
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "50000"))
+
+# Pool de connexions PostgreSQL partagé par les threads d'un worker
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))  # attente d'une connexion libre (s)
+DB_POOL_CHECK_SECONDS = float(os.getenv("DB_POOL_CHECK_SECONDS", "30"))  # SELECT 1 après inactivité
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "5000"))  # 0 = désactivé
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+DB_PREPARED_STATEMENTS = int(os.getenv("DB_PREPARED_STATEMENTS", "1"))  # 0 = désactivé (pgbouncer)
+
+# Mesure des latences : fenêtre des quantiles de /metrics et en-têtes X-Trace-Id / Server-Timing
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "1024"))
+TIMING_HEADERS = int(os.getenv("TIMING_HEADERS", "1"))  # 0 = désactivé
@@ -0,0 +1,77 @@
+""" this module turns the top-k retrieved documents into the `context` of
+    the answer prompt:
+    - near-identical passages are dropped (word 3-gram Jaccard similarity);
+    - the remaining ones are packed best-first into CONTEXT_TOKEN_BUDGET,
+      the last one truncated at a word boundary if it does not fit;
+    - each passage is numbered with its source, and the list of the
+      sources that made it into the prompt is returned with the context.
+    """
+import math
+from typing import List, Tuple
+from config import CONTEXT_TOKEN_BUDGET, CONTEXT_DEDUP_THRESHOLD
+from response_cache import normalize_question
+
+# Approximation sans tokenizer local : ~4 caractères par token en anglais
+CHARS_PER_TOKEN = 4
+MIN_PASSAGE_TOKENS = 50  # en dessous, un passage tronqué n'apporte plus rien
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of `text` for budgeting."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = normalize_question(text).split()
+    if len(words) <= size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _is_duplicate(shingles: set, kept: List[set], threshold: float) -> bool:
+    return any(len(shingles & other) / max(len(shingles | other), 1) >= threshold
+               for other in kept)
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    cut = text[:max_chars].rsplit(" ", 1)[0]
+    return cut.rstrip(" ,;:") + " [...]"
+
+
+def assemble_context(matches: List[dict], token_budget: int = CONTEXT_TOKEN_BUDGET,
+                     text_field: str = "answer",
+                     dedup_threshold: float = CONTEXT_DEDUP_THRESHOLD) -> Tuple[str, List[dict]]:
+    """Build the prompt context from ranked matches.
+
+    Returns the context and one entry per passage used: its number in the
+    context, source, focus_area, similarity and whether it was truncated.
+    """
+    passages, sources, kept_shingles = [], [], []
+    remaining = token_budget
+    for match in matches:
+        text = " ".join(str(match.get(text_field) or "").split())
+        if not text:
+            continue
+        shingles = _shingles(text)
+        if _is_duplicate(shingles, kept_shingles, dedup_threshold):
+            continue
+
+        number = len(passages) + 1
+        header = f"[{number}] (source: {match.get('source')}, focus area: {match.get('focus_area')})"
+        available = remaining - estimate_tokens(header) - 1
+        truncated = estimate_tokens(text) > available
+        if truncated:
+            if available < MIN_PASSAGE_TOKENS:
+                break
+            text = _truncate(text, available * CHARS_PER_TOKEN)
+
+        passage = f"{header}\n{text}"
+        passages.append(passage)
+        kept_shingles.append(shingles)
+        remaining -= estimate_tokens(passage) + 1
+        sources.append({"id": number, "source": match.get("source"),
+                        "focus_area": match.get("focus_area"),
+                        "similarity": match.get("similarity"), "truncated": truncated})
+        if truncated:
+            break
+    return "\n\n".join(passages), sources
@@ -0,0 +1,220 @@
+""" this module keeps a pool of PostgreSQL connections shared by the
+    threads of a worker, instead of one TCP+TLS+auth handshake per query.
+
+    - connections are opened lazily, up to DB_POOL_MAX; callers wait at
+      most DB_POOL_TIMEOUT seconds for a free one (PoolTimeout afterwards);
+    - a connection idle for more than DB_POOL_CHECK_SECONDS is checked with
+      `SELECT 1` before being handed out, and broken ones are replaced;
+    - every connection gets DB_STATEMENT_TIMEOUT_MS as statement_timeout;
+    - `execute` runs hot queries as server-side prepared statements
+      (PREPARE once per connection, then EXECUTE);
+    - `stats()` reports usage and waits, to size the pool per worker count.
+
+    psycopg2.pool is not used: it closes every connection returned above
+    `minconn`, which would bring the handshakes back under load.
+    """
+import hashlib
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Sequence
+import psycopg2
+from psycopg2 import extensions
+from config import (DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD, DB_POOL_MIN, DB_POOL_MAX,
+                    DB_POOL_TIMEOUT, DB_POOL_CHECK_SECONDS, DB_STATEMENT_TIMEOUT_MS,
+                    DB_CONNECT_TIMEOUT, DB_PREPARED_STATEMENTS)
+
+
+class PoolTimeout(RuntimeError):
+    """No connection became free within the pool timeout."""
+
+
+def _to_positional(sql: str) -> str:
+    """Rewrite psycopg2 `%s` placeholders as PREPARE's `$1, $2...`."""
+    counter = iter(range(1, sql.count("%s") + 1))
+    return re.sub(r"%s", lambda _: f"${next(counter)}", sql)
+
+
+class ConnectionPool:
+    """Thread-safe psycopg2 pool with health checks, timeouts and metrics."""
+
+    def __init__(self, minconn: int = DB_POOL_MIN, maxconn: int = DB_POOL_MAX,
+                 timeout: float = DB_POOL_TIMEOUT, check_seconds: float = DB_POOL_CHECK_SECONDS,
+                 statement_timeout_ms: int = DB_STATEMENT_TIMEOUT_MS,
+                 prepare: bool = bool(DB_PREPARED_STATEMENTS), **connect_kwargs) -> None:
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.check_seconds = check_seconds
+        self.prepare = prepare
+        options = f"-c statement_timeout={statement_timeout_ms}" if statement_timeout_ms else ""
+        self.connect_kwargs = {
+            "dbname": DB_NAME, "user": DB_USER, "password": DB_PASSWORD, "host": DB_HOST,
+            "port": DB_PORT, "connect_timeout": DB_CONNECT_TIMEOUT,
+            "application_name": "genai-backend", "options": options, **connect_kwargs}
+        self._idle: List = []
+        self._open = 0
+        self._started = False
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._last_used = {}  # id(conn) -> instant du dernier retour au pool
+        self._prepared = {}  # id(conn) -> noms des requêtes préparées
+        self.counters = {"checkouts": 0, "waits": 0, "timeouts": 0, "opened": 0,
+                         "discarded": 0, "health_checks": 0, "prepared": 0}
+        self._wait_seconds = 0.0
+        self._max_wait = 0.0
+        self._in_use = 0
+        self._peak_in_use = 0
+
+    def _connect(self):
+        conn = psycopg2.connect(**self.connect_kwargs)
+        with self._lock:
+            self._open += 1
+            self.counters["opened"] += 1
+        return conn
+
+    def _start(self) -> None:
+        # Ouvert au premier usage : importer le module n'ouvre aucune connexion
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for _ in range(self.minconn):
+            conn = self._connect()
+            with self._lock:
+                self._idle.append(conn)
+                self._last_used[id(conn)] = time.monotonic()
+
+    @contextmanager
+    def connection(self, statement_timeout_ms: Optional[int] = None):
+        """Borrow a healthy connection; it is rolled back and returned on exit.
+
+        `statement_timeout_ms` overrides the pool's timeout for this use
+        (0 = none), e.g. for full-table loads.
+        """
+        start_time = time.perf_counter()
+        if not self._slots.acquire(blocking=False):
+            self.counters["waits"] += 1
+            if not self._slots.acquire(timeout=self.timeout):
+                self.counters["timeouts"] += 1
+                raise PoolTimeout(f"No database connection free after {self.timeout:.0f} s")
+        waited = time.perf_counter() - start_time
+        conn = None
+        try:
+            conn = self._checkout()
+            with self._lock:
+                self._wait_seconds += waited
+                self._max_wait = max(self._max_wait, waited)
+                self._in_use += 1
+                self._peak_in_use = max(self._peak_in_use, self._in_use)
+            if statement_timeout_ms is not None:
+                with conn.cursor() as cur:
+                    cur.execute("SET statement_timeout = %s", (statement_timeout_ms,))
+                conn.commit()
+            yield conn
+        finally:
+            if conn is not None:
+                with self._lock:
+                    self._in_use -= 1
+                self._release(conn, reset_timeout=statement_timeout_ms is not None)
+            self._slots.release()
+
+    def _checkout(self):
+        if not self._started:
+            self._start()
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+                self.counters["checkouts"] += 1
+            if conn is None:
+                return self._connect()
+            idle = time.monotonic() - self._last_used.get(id(conn), 0.0)
+            if not conn.closed and idle < self.check_seconds:
+                return conn
+            if not conn.closed:
+                self.counters["health_checks"] += 1
+                try:
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT 1")
+                    conn.rollback()
+                    return conn
+                except psycopg2.Error:
+                    pass
+            # Connexion coupée (redémarrage, idle timeout côté serveur...) : on la remplace
+            self._discard(conn)
+
+    def _release(self, conn, reset_timeout: bool = False) -> None:
+        try:
+            if not conn.closed:
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if reset_timeout:
+                    with conn.cursor() as cur:
+                        cur.execute("RESET statement_timeout")
+                    conn.commit()
+        except psycopg2.Error:
+            self._discard(conn)
+            return
+        if conn.closed:
+            self._discard(conn)
+            return
+        with self._lock:
+            self._last_used[id(conn)] = time.monotonic()
+            self._idle.append(conn)
+
+    def _discard(self, conn) -> None:
+        with self._lock:
+            self.counters["discarded"] += 1
+            self._open -= 1
+            self._last_used.pop(id(conn), None)
+            self._prepared.pop(id(conn), None)
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def execute(self, cur, sql: str, params: Sequence = ()) -> None:
+        """Execute `sql` (with %s placeholders) as a prepared statement on `cur`.
+
+        The statement is prepared the first time a connection runs it; with
+        DB_PREPARED_STATEMENTS=0 (e.g. behind pgbouncer) it is executed as is.
+        """
+        if not self.prepare:
+            cur.execute(sql, params)
+            return
+        name = "q_" + hashlib.sha1(sql.encode("utf-8")).hexdigest()[:16]
+        prepared = self._prepared.setdefault(id(cur.connection), set())
+        if name not in prepared:
+            cur.execute(f"PREPARE {name} AS {_to_positional(sql)}")
+            prepared.add(name)
+            self.counters["prepared"] += 1
+        if params:
+            cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+        else:
+            cur.execute(f"EXECUTE {name}")
+
+    def stats(self) -> dict:
+        """Pool usage, for the admin endpoint."""
+        checkouts = self.counters["checkouts"] or 1
+        return {
+            "max_size": self.maxconn,
+            "open": self._open,
+            "in_use": self._in_use,
+            "peak_in_use": self._peak_in_use,
+            "idle": len(self._idle),
+            "avg_wait_ms": round(1000 * self._wait_seconds / checkouts, 3),
+            "max_wait_ms": round(1000 * self._max_wait, 3),
+            **self.counters,
+        }
+
+    def close(self) -> None:
+        """Close the idle connections; the pool reopens on next use."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._started = False
+        for conn in idle:
+            self._discard(conn)
+
+
+db_pool = ConnectionPool()
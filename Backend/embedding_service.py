@@ -0,0 +1,117 @@
+""" this module wraps the query encoder in a thread-safe service with
+    - a bounded LRU cache keyed on a hash of the text;
+    - a micro-batcher that gathers the requests arriving within a few
+      milliseconds of each other and encodes them in one forward pass.
+    agents.generate_embedding / generate_embeddings go through it, so the
+    API, the metrics and the evaluation scripts all share it.
+    """
+import hashlib
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+import numpy as np
+from config import EMBEDDING_CACHE_SIZE, EMBEDDING_MAX_BATCH, EMBEDDING_BATCH_WAIT_MS
+
+
+class EmbeddingService:
+    """Cached, micro-batched access to an `encode(texts) -> array` function."""
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray],
+                 cache_size: int = EMBEDDING_CACHE_SIZE,
+                 max_batch_size: int = EMBEDDING_MAX_BATCH,
+                 max_wait_ms: float = EMBEDDING_BATCH_WAIT_MS) -> None:
+        self.encode = encode
+        self.cache_size = cache_size
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+        self.stats = {"cache_hits": 0, "cache_misses": 0, "batches": 0, "encoded": 0}
+
+    def embed(self, text: str) -> List[float]:
+        """Embedding of one text."""
+        return self.embed_many([text])[0]
+
+    def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """Embeddings of several texts; cache misses join the current micro-batch."""
+        keys = [hashlib.sha1(text.encode("utf-8")).hexdigest() for text in texts]
+        vectors = [self._cache_get(key) for key in keys]
+
+        pending = {}
+        for text, key, vector in zip(texts, keys, vectors):
+            if vector is None and key not in pending:
+                pending[key] = self._submit(text, key)
+        results = {key: future.result() for key, future in pending.items()}
+
+        return [(vector if vector is not None else results[key]).tolist()
+                for key, vector in zip(keys, vectors)]
+
+    def _cache_get(self, key: str) -> Optional[np.ndarray]:
+        with self._cache_lock:
+            vector = self._cache.get(key)
+            if vector is None:
+                self.stats["cache_misses"] += 1
+                return None
+            self._cache.move_to_end(key)
+            self.stats["cache_hits"] += 1
+            return vector
+
+    def _cache_put(self, key: str, vector: np.ndarray) -> None:
+        if not self.cache_size:
+            return
+        with self._cache_lock:
+            self._cache[key] = vector
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _submit(self, text: str, key: str) -> Future:
+        if self._worker is None:
+            with self._worker_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(
+                        target=self._run, daemon=True, name="embedding-batcher")
+                    self._worker.start()
+        future = Future()
+        self._queue.put((text, key, future))
+        return future
+
+    def _run(self) -> None:
+        """Worker loop: wait for a request, gather more for up to max_wait, encode."""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._encode_batch(batch)
+
+    def _encode_batch(self, batch: list) -> None:
+        # Plusieurs threads peuvent demander le même texte dans la même fenêtre
+        unique = list(dict.fromkeys((text, key) for text, key, _ in batch))
+        try:
+            vectors = np.asarray(self.encode([text for text, _ in unique]), dtype=np.float32)
+        except Exception as e:  # pylint: disable=broad-except
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        by_key = {}
+        for (_, key), vector in zip(unique, vectors):
+            by_key[key] = vector
+            self._cache_put(key, vector)
+        self.stats["batches"] += 1
+        self.stats["encoded"] += len(unique)
+        for _, key, future in batch:
+            future.set_result(by_key[key])
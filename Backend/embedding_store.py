@@ -0,0 +1,146 @@
+""" this module stores embeddings as raw little-endian float32 bytes
+    (`bytea`) and bulk-loads them with `COPY ... TO STDOUT (FORMAT binary)`
+    straight into a preallocated NumPy buffer, without json.loads or one
+    Python list per row. Each JSON embedding column `<column>` gets its
+    binary copy in `<column>_f32`.
+
+    One-shot conversion of the existing JSON-text column (from Backend):
+        python embedding_store.py ae_qa_table
+        python embedding_store.py ae_med_table --column embedding
+    """
+import argparse
+import json
+import struct
+from typing import List, Sequence, Tuple
+import numpy as np
+from psycopg2.extras import execute_values
+from config import TABLE_NAME, EMBEDDING_DIM
+from embedding_versions import LEGACY_COLUMN, binary_column
+
+BINARY_COLUMN = binary_column(LEGACY_COLUMN)
+CONVERSION_BATCH_SIZE = 2000
+
+# En-tête du format COPY binaire : signature (11 octets), flags, longueur d'extension
+COPY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+COPY_HEADER = struct.Struct("!11sii")
+
+
+def to_binary(embedding: Sequence[float]) -> bytes:
+    """Encode an embedding for the `bytea` column."""
+    return np.asarray(embedding, dtype="<f4").tobytes()
+
+
+class _PreallocatedSink:
+    """File-like target for `copy_expert` that fills a fixed-size buffer in place."""
+
+    def __init__(self, size: int) -> None:
+        self.buffer = np.empty(size, dtype=np.uint8)
+        self.offset = 0
+
+    def write(self, data) -> int:
+        """Copy one chunk of the COPY stream into the buffer."""
+        chunk = np.frombuffer(data, dtype=np.uint8)
+        end = self.offset + len(chunk)
+        if end > len(self.buffer):
+            raise ValueError("COPY stream larger than expected; table changed during load?")
+        self.buffer[self.offset:end] = chunk
+        self.offset = end
+        return len(chunk)
+
+
+def load_embeddings(conn, table: str, columns: Sequence[str], dim: int = EMBEDDING_DIM,
+                    source: str = LEGACY_COLUMN) -> Tuple[List[dict], np.ndarray]:
+    """Load metadata rows and a (n, dim) float32 matrix from the binary copy of `source`.
+
+    Both reads run in one REPEATABLE READ transaction ordered by id, so the
+    i-th metadata row always matches the i-th embedding.
+    """
+    binary = binary_column(source)
+    with conn.cursor() as cur:
+        cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        where = f"WHERE {binary} IS NOT NULL"
+        cur.execute(f"SELECT {', '.join(columns)} FROM {table} {where} ORDER BY id")
+        rows = [dict(zip(columns, row)) for row in cur.fetchall()]
+
+        # Chaque tuple : nb de champs (int16), longueur (int32), dim float32
+        record = np.dtype([("fields", ">i2"), ("length", ">i4"), ("vector", "<f4", (dim,))])
+        sink = _PreallocatedSink(COPY_HEADER.size + len(rows) * record.itemsize + 2)
+        cur.copy_expert(
+            f"COPY (SELECT {binary} FROM {table} {where} ORDER BY id) "
+            "TO STDOUT (FORMAT binary)", sink)
+    conn.rollback()
+
+    signature, _, extension = COPY_HEADER.unpack_from(sink.buffer)
+    if signature != COPY_SIGNATURE or extension != 0:
+        raise ValueError("Unexpected COPY binary header")
+    start = COPY_HEADER.size
+    records = sink.buffer[start:start + len(rows) * record.itemsize].view(record)
+    if np.any(records["fields"] != 1) or np.any(records["length"] != dim * 4):
+        raise ValueError(f"{table}.{binary} contains vectors that are not {dim}-d float32")
+
+    return rows, records["vector"]
+
+
+def convert_to_binary(conn, table: str = TABLE_NAME,
+                      batch_size: int = CONVERSION_BATCH_SIZE,
+                      source: str = LEGACY_COLUMN, dim: int = EMBEDDING_DIM) -> int:
+    """Fill the binary column from the JSON-text `source` column.
+
+    Walks the table by id in batches and only converts rows whose binary
+    column is still NULL, so it can be re-run after new rows are embedded.
+    Returns the number of converted rows.
+    """
+    binary = binary_column(source)
+    with conn.cursor() as cur:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {binary} bytea")
+        conn.commit()
+
+        converted, last_id = 0, -1
+        while True:
+            cur.execute(
+                f"""SELECT id, {source} FROM {table}
+                WHERE id > %s AND {source} IS NOT NULL AND {binary} IS NULL
+                ORDER BY id LIMIT %s""", (last_id, batch_size))
+            batch = cur.fetchall()
+            if not batch:
+                break
+            last_id = batch[-1][0]
+
+            values = []
+            for row_id, embedding in batch:
+                try:
+                    vector = json.loads(embedding) if isinstance(embedding, str) else embedding
+                except (json.JSONDecodeError, TypeError):
+                    print(f"Erreur de décodage JSON pour l'id : {row_id}")
+                    continue
+                if len(vector) != dim:
+                    print(f"Dimension inattendue ({len(vector)}) pour l'id : {row_id}")
+                    continue
+                values.append((row_id, to_binary(vector)))
+
+            execute_values(
+                cur,
+                f"""UPDATE {table} AS t SET {binary} = v.data
+                FROM (VALUES %s) AS v (id, data) WHERE t.id = v.id""",
+                values)
+            conn.commit()
+            converted += len(values)
+            print(f"{table}: {converted} embeddings convertis")
+
+    return converted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert JSON embeddings to float32 bytea.")
+    parser.add_argument("table", nargs="?", default=TABLE_NAME)
+    parser.add_argument("--batch-size", type=int, default=CONVERSION_BATCH_SIZE)
+    parser.add_argument("--column", default=LEGACY_COLUMN, help="JSON embedding column")
+    parser.add_argument("--dim", type=int, default=EMBEDDING_DIM)
+    args = parser.parse_args()
+
+    from retrieve import connect_db  # pylint: disable=import-outside-toplevel
+    connection = connect_db()
+    try:
+        convert_to_binary(connection, args.table, args.batch_size, args.column, args.dim)
+    finally:
+        connection.close()
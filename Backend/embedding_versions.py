@@ -0,0 +1,258 @@
+""" this module tags stored embeddings with the model that produced them,
+    so the query encoder and the corpus vectors can never silently differ.
+
+    Each table has one embedding column per model version, registered in
+    `embedding_versions` with its model id, dimension and state:
+        building -> shadow column being filled by the backfill job
+        ready    -> complete, servable by API workers running that model
+        active   -> the table's reference version (one per table)
+    The original `embedding` column is registered as all-mpnet-base-v2/768.
+    API workers serve the version matching their EMBEDDING_MODEL and refuse
+    to search when it is not servable: a `ready` version must also cover
+    every row embedded for the active one, so rows ingested after it was
+    completed are never silently missing (backfill them with
+    `backfill.py --all-versions`). The binary (`<column>_f32`) and pgvector
+    (`<column>_vec`) copies follow the same naming per version.
+
+    The query encoder is fixed per worker, so traffic moves to a new model
+    with the rollout of workers configured for it; `cutover` only changes
+    which version is the reference one, it does not switch traffic itself.
+
+    Model migration (from the Backend directory):
+        python embedding_versions.py shadow qa --model BAAI/bge-small-en-v1.5 --dim 384
+        python backfill.py qa --model BAAI/bge-small-en-v1.5 --dim 384
+        (roll out workers with EMBEDDING_MODEL/EMBEDDING_DIM set to the new model)
+        python embedding_versions.py cutover qa --model BAAI/bge-small-en-v1.5 --dim 384
+        python embedding_versions.py retire qa --model sentence-transformers/all-mpnet-base-v2 --dim 768
+    """
+import argparse
+import hashlib
+import re
+from typing import List, NamedTuple
+from config import EMBEDDING_MODEL, EMBEDDING_DIM
+
+REGISTRY_TABLE = "embedding_versions"
+LEGACY_MODEL = "sentence-transformers/all-mpnet-base-v2"
+LEGACY_DIM = 768
+LEGACY_COLUMN = "embedding"
+SERVABLE_STATES = ("ready", "active")
+
+
+class EmbeddingVersionError(RuntimeError):
+    """No complete embedding column for the requested model version."""
+
+
+class EmbeddingVersion(NamedTuple):
+    """One registered embedding column of a table."""
+    tag: str
+    model: str
+    dim: int
+    column: str
+    state: str
+
+
+def model_tag(model: str, dim: int) -> str:
+    """Identifier of a model version, e.g. 'sentence-transformers/all-mpnet-base-v2@768'."""
+    return f"{model}@{dim}"
+
+
+QUERY_MODEL_TAG = model_tag(EMBEDDING_MODEL, EMBEDDING_DIM)
+LEGACY_VERSION = EmbeddingVersion(model_tag(LEGACY_MODEL, LEGACY_DIM), LEGACY_MODEL,
+                                  LEGACY_DIM, LEGACY_COLUMN, "active")
+
+
+def column_name(model: str, dim: int) -> str:
+    """Shadow column for a model version (fits PostgreSQL's 63-char limit with its suffixes)."""
+    if model_tag(model, dim) == LEGACY_VERSION.tag:
+        return LEGACY_COLUMN
+    slug = re.sub(r"[^a-z0-9]+", "_", model.split("/")[-1].lower()).strip("_")
+    digest = hashlib.sha1(model.encode("utf-8")).hexdigest()[:6]
+    return f"embedding_{slug[:32]}_{dim}_{digest}"
+
+
+def binary_column(column: str) -> str:
+    """Float32 `bytea` copy of an embedding column."""
+    return f"{column}_f32"
+
+
+def vector_column(column: str) -> str:
+    """pgvector copy of an embedding column."""
+    return f"{column}_vec"
+
+
+def _registry_exists(cur) -> bool:
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL", (REGISTRY_TABLE,))
+    return cur.fetchone()[0]
+
+
+def ensure_registry(conn, table: str) -> None:
+    """Create the registry if needed and register the original column of `table`."""
+    with conn.cursor() as cur:
+        cur.execute(f"""CREATE TABLE IF NOT EXISTS {REGISTRY_TABLE} (
+                    table_name text NOT NULL, tag text NOT NULL, model text NOT NULL,
+                    dim integer NOT NULL, column_name text NOT NULL, state text NOT NULL,
+                    updated_at timestamptz NOT NULL DEFAULT now(),
+                    PRIMARY KEY (table_name, tag))""")
+        cur.execute(
+            f"""INSERT INTO {REGISTRY_TABLE} (table_name, tag, model, dim, column_name, state)
+            SELECT %s, %s, %s, %s, %s, 'active'
+            WHERE NOT EXISTS (SELECT 1 FROM {REGISTRY_TABLE} WHERE table_name = %s)""",
+            (table, *LEGACY_VERSION[:4], table))
+    conn.commit()
+
+
+def list_versions(conn, table: str) -> List[EmbeddingVersion]:
+    """Registered versions of `table`; only the original column without a registry."""
+    with conn.cursor() as cur:
+        if not _registry_exists(cur):
+            conn.rollback()
+            return [LEGACY_VERSION]
+        cur.execute(f"""SELECT tag, model, dim, column_name, state FROM {REGISTRY_TABLE}
+                    WHERE table_name = %s ORDER BY updated_at""", (table,))
+        versions = [EmbeddingVersion(*row) for row in cur.fetchall()]
+    conn.rollback()
+    return versions or [LEGACY_VERSION]
+
+
+def lagging_count(conn, table: str, version: EmbeddingVersion,
+                  reference: EmbeddingVersion) -> int:
+    """Rows embedded for `reference` but not yet for `version`."""
+    with conn.cursor() as cur:
+        cur.execute(f"""SELECT count(*) FROM {table}
+                    WHERE {version.column} IS NULL AND {reference.column} IS NOT NULL""")
+        count = cur.fetchone()[0]
+    conn.rollback()
+    return count
+
+
+def serving_version(conn, table: str, tag: str = QUERY_MODEL_TAG) -> EmbeddingVersion:
+    """The version to search with a query encoder of `tag`.
+
+    Raises EmbeddingVersionError when that model has no complete column, so
+    queries are never compared with vectors of another model, nor run
+    against a `ready` version missing rows of the active one.
+    """
+    versions = list_versions(conn, table)
+    active = next((v for v in versions if v.state == "active"), None)
+    for version in versions:
+        if version.tag != tag or version.state not in SERVABLE_STATES:
+            continue
+        if version.state == "ready" and active is not None:
+            lagging = lagging_count(conn, table, version, active)
+            if lagging:
+                raise EmbeddingVersionError(
+                    f"{table}: {lagging} rows have no {tag} embedding yet "
+                    f"(run backfill.py --all-versions)")
+        return version
+    available = ", ".join(f"{v.tag} ({v.state})" for v in versions)
+    raise EmbeddingVersionError(
+        f"{table} has no servable embeddings for {tag}; registered: {available}")
+
+
+def missing_count(conn, table: str, column: str, text_column: str) -> int:
+    """Rows with text to embed but no vector in `column`."""
+    with conn.cursor() as cur:
+        cur.execute(f"""SELECT count(*) FROM {table}
+                    WHERE {column} IS NULL AND coalesce(trim({text_column}), '') <> ''""")
+        count = cur.fetchone()[0]
+    conn.rollback()
+    return count
+
+
+def start_shadow(conn, table: str, model: str, dim: int) -> EmbeddingVersion:
+    """Register `model` for `table` and add its column (no-op if it exists)."""
+    ensure_registry(conn, table)
+    column = column_name(model, dim)
+    with conn.cursor() as cur:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} text")
+        cur.execute(
+            f"""INSERT INTO {REGISTRY_TABLE} (table_name, tag, model, dim, column_name, state)
+            VALUES (%s, %s, %s, %s, %s, 'building') ON CONFLICT DO NOTHING""",
+            (table, model_tag(model, dim), model, dim, column))
+        cur.execute(f"""SELECT tag, model, dim, column_name, state FROM {REGISTRY_TABLE}
+                    WHERE table_name = %s AND tag = %s""", (table, model_tag(model, dim)))
+        version = EmbeddingVersion(*cur.fetchone())
+    conn.commit()
+    return version
+
+
+def mark_ready(conn, table: str, version: EmbeddingVersion, text_column: str) -> bool:
+    """Move a complete `building` version to `ready`; returns whether it is servable."""
+    if version.state in SERVABLE_STATES:
+        return True
+    missing = missing_count(conn, table, version.column, text_column)
+    if missing:
+        print(f"{table}: {missing} lignes sans embedding pour {version.tag}")
+        return False
+    with conn.cursor() as cur:
+        cur.execute(f"""UPDATE {REGISTRY_TABLE} SET state = 'ready', updated_at = now()
+                    WHERE table_name = %s AND tag = %s""", (table, version.tag))
+    conn.commit()
+    return True
+
+
+def cutover(conn, table: str, tag: str) -> None:
+    """Make `tag` the reference version of `table`, in one transaction.
+
+    Workers keep serving the version of their own EMBEDDING_MODEL: run this
+    once the workers of the new model are rolled out. The previous active
+    version goes back to `ready` (served only while it stays complete), so
+    cutting over again to it is possible as long as it is not retired.
+    """
+    with conn.cursor() as cur:
+        cur.execute(f"""SELECT tag, state FROM {REGISTRY_TABLE}
+                    WHERE table_name = %s FOR UPDATE""", (table,))
+        states = dict(cur.fetchall())
+        if states.get(tag) not in SERVABLE_STATES:
+            conn.rollback()
+            raise EmbeddingVersionError(f"{tag} is not ready for {table} ({states.get(tag)})")
+        cur.execute(f"""UPDATE {REGISTRY_TABLE} SET state = 'ready', updated_at = now()
+                    WHERE table_name = %s AND state = 'active'""", (table,))
+        cur.execute(f"""UPDATE {REGISTRY_TABLE} SET state = 'active', updated_at = now()
+                    WHERE table_name = %s AND tag = %s""", (table, tag))
+    conn.commit()
+
+
+def retire(conn, table: str, tag: str) -> None:
+    """Unregister a non-active version and drop its columns."""
+    version = next((v for v in list_versions(conn, table) if v.tag == tag), None)
+    if version is None:
+        raise EmbeddingVersionError(f"{tag} is not registered for {table}")
+    if version.state == "active":
+        raise EmbeddingVersionError(f"{tag} is the active version of {table}")
+    with conn.cursor() as cur:
+        cur.execute(f"DELETE FROM {REGISTRY_TABLE} WHERE table_name = %s AND tag = %s",
+                    (table, tag))
+        for column in (version.column, binary_column(version.column),
+                       vector_column(version.column)):
+            cur.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS {column}")
+    conn.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage embedding model versions.")
+    parser.add_argument("action", choices=("status", "shadow", "cutover", "retire"))
+    parser.add_argument("corpus", choices=("qa", "med"))
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--dim", type=int, default=EMBEDDING_DIM)
+    args = parser.parse_args()
+
+    # pylint: disable=import-outside-toplevel
+    from retrieve import connect_db, TABLE_NAME, MED_TABLE
+    target_table = {"qa": TABLE_NAME, "med": MED_TABLE}[args.corpus]
+    target_tag = model_tag(args.model, args.dim)
+    connection = connect_db()
+    try:
+        if args.action == "shadow":
+            created = start_shadow(connection, target_table, args.model, args.dim)
+            print(f"{target_table}: colonne {created.column} ({created.state})")
+        elif args.action == "cutover":
+            cutover(connection, target_table, target_tag)
+            print(f"{target_table}: {target_tag} est la version active")
+        elif args.action == "retire":
+            retire(connection, target_table, target_tag)
+            print(f"{target_table}: {target_tag} supprimée")
+        for registered in list_versions(connection, target_table):
+            print(f"  {registered.state:<8} {registered.tag:<55} {registered.column}")
+    finally:
+        connection.close()
@@ -1,20 +1,16 @@
 """This module evaluates the chatbot."""
 import numpy as np
 from Backend.config import TABLE_NAME
-from Backend.retrieve import connect_db
+from Backend.retrieve import db_connection
 from langchain_core.prompts import ChatPromptTemplate
-from agents import generate_response , llm
+from agents import generate_response, get_llm
 
 def get_random_questions(n):
     """Récupère n questions aléatoires depuis la base de données."""
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute(
-        f"SELECT question, answer FROM {TABLE_NAME} ORDER BY RANDOM() LIMIT %s", (n,))
-    data = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return data
+    with db_connection() as conn, conn.cursor() as cursor:
+        cursor.execute(
+            f"SELECT question, answer FROM {TABLE_NAME} ORDER BY RANDOM() LIMIT %s", (n,))
+        return cursor.fetchall()
 
 
 def evaluate_chatbot(n):
@@ -59,7 +55,7 @@ def evaluate_chatbot(n):
             Provide scores separated by commas.
             """
         )
-        evaluation_chain = evaluation_prompt | llm
+        evaluation_chain = evaluation_prompt | get_llm()
         evaluation = evaluation_chain.invoke({
             "question": question,
             "true_answer": true_answer,
@@ -1,34 +1,177 @@
-"""
-ingest file
-"""
+""" this module bulk-loads a CSV into the QA or medication table.
+
+    The CSV is streamed in chunks; each chunk is sent with `COPY FROM STDIN`
+    (or `execute_values`) into a temporary staging table and inserted with
+    `ON CONFLICT (content_hash) DO NOTHING`. The content hash (md5 of the
+    ingested columns) makes re-runs idempotent and drops duplicated rows,
+    and each chunk is its own transaction, so a bad chunk is reported and
+    skipped instead of aborting the whole import.
+
+    Usage (from the Backend directory):
+        python ingest.py ../Datasets/dataset_utf8.csv --corpus qa
+        python ingest.py ../Datasets/medoc_info.csv --corpus med --chunk-size 20000
+    New rows have no embedding yet; they are picked up by the embedding job.
+    """
+import argparse
+import hashlib
+import io
+import time
+from typing import Iterable, Sequence, Tuple
 import pandas as pd
-import psycopg2
-from config import DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD
+from psycopg2.extras import execute_values
+from retrieve import connect_db, TABLE_NAME, MED_TABLE
+
+HASH_COLUMN = "content_hash"
+CHUNK_SIZE = 50000
+STAGING_TABLE = "ingest_staging"
+# Colonnes chargées depuis le CSV, et colonne qui doit être renseignée
+CORPORA = {
+    "qa": (TABLE_NAME, ("question", "answer", "source", "focus_area"), "answer"),
+    "med": (MED_TABLE, ("drug", "indication", "side_effects", "drug_interaction", "dosage"),
+            "drug"),
+}
+# Séparateur des champs dans le hash (unit separator, absent des textes)
+HASH_SEPARATOR = "\x1f"
+
+
+def content_hash(values: Iterable) -> str:
+    """md5 of the ingested fields, identical to `_sql_hash` computed in PostgreSQL."""
+    text = HASH_SEPARATOR.join("" if value is None else str(value) for value in values)
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+
+def _sql_hash(columns: Sequence[str]) -> str:
+    fields = ", ".join(f"coalesce({column}, '')" for column in columns)
+    return f"md5(concat_ws(chr(31), {fields}))"
+
+
+def prepare_table(conn, table: str, columns: Sequence[str],
+                  drop_duplicates: bool = False) -> None:
+    """Add the hash column, fill it for existing rows and make it unique.
+
+    Rows loaded before this tool (row by row, possibly twice) may already
+    be duplicated; the unique index cannot be built until they are removed,
+    which only happens with `drop_duplicates` (the lowest id is kept).
+    """
+    with conn.cursor() as cur:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {HASH_COLUMN} text")
+        cur.execute(f"UPDATE {table} SET {HASH_COLUMN} = {_sql_hash(columns)} "
+                    f"WHERE {HASH_COLUMN} IS NULL")
+        if cur.rowcount:
+            print(f"{table}: hash calculé pour {cur.rowcount} lignes existantes")
+
+        cur.execute(f"""SELECT count(*) - count(DISTINCT {HASH_COLUMN}) FROM {table}""")
+        duplicates = cur.fetchone()[0]
+        if duplicates and not drop_duplicates:
+            conn.rollback()
+            raise SystemExit(f"{table} contient {duplicates} doublons ; "
+                             "relancer avec --drop-duplicates pour les supprimer")
+        if duplicates:
+            cur.execute(f"""DELETE FROM {table} t USING {table} d
+                        WHERE t.{HASH_COLUMN} = d.{HASH_COLUMN} AND t.id > d.id""")
+            print(f"{table}: {cur.rowcount} doublons supprimés")
+
+        cur.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {table}_{HASH_COLUMN}_idx "
+                    f"ON {table} ({HASH_COLUMN})")
+        cur.execute(f"""CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE}
+                    AS SELECT {", ".join(columns)}, {HASH_COLUMN} FROM {table} WITH NO DATA""")
+    conn.commit()
+
+
+def read_chunks(path: str, columns: Sequence[str], required: str,
+                chunk_size: int = CHUNK_SIZE) -> Iterable[Tuple[int, pd.DataFrame]]:
+    """Yield (rows read, chunk) with the chunk restricted to `columns` plus its hash.
+
+    Rows without `required` are dropped, as are rows repeated within a chunk.
+    """
+    # Seules les cellules vides valent NULL ("NA", "null"... sont du texte)
+    for chunk in pd.read_csv(path, encoding="utf-8", usecols=list(columns), dtype=str,
+                             keep_default_na=False, na_values=[""], chunksize=chunk_size):
+        total = len(chunk)
+        chunk = chunk[list(columns)].astype(object).where(chunk.notna(), None)
+        chunk = chunk[chunk[required].fillna("").str.strip() != ""]
+        chunk = chunk.assign(**{HASH_COLUMN: [
+            content_hash(row) for row in chunk.itertuples(index=False, name=None)]})
+        chunk = chunk.drop_duplicates(HASH_COLUMN)
+        yield total, chunk
+
+
+def _stage_copy(cur, chunk: pd.DataFrame) -> None:
+    buffer = io.StringIO()
+    # En CSV, un champ vide non quoté est lu comme NULL par COPY
+    chunk.to_csv(buffer, header=False, index=False)
+    buffer.seek(0)
+    cur.copy_expert(f"COPY {STAGING_TABLE} FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def _stage_values(cur, chunk: pd.DataFrame) -> None:
+    execute_values(cur, f"INSERT INTO {STAGING_TABLE} VALUES %s",
+                   list(chunk.itertuples(index=False, name=None)), page_size=1000)
+
+
+def load_chunk(conn, table: str, columns: Sequence[str], chunk: pd.DataFrame,
+               method: str = "copy") -> int:
+    """Insert one chunk in its own transaction; returns the number of new rows."""
+    fields = ", ".join((*columns, HASH_COLUMN))
+    with conn.cursor() as cur:
+        cur.execute(f"TRUNCATE {STAGING_TABLE}")
+        if method == "copy":
+            _stage_copy(cur, chunk)
+        else:
+            _stage_values(cur, chunk)
+        cur.execute(f"""INSERT INTO {table} ({fields})
+                    SELECT {fields} FROM {STAGING_TABLE}
+                    ON CONFLICT ({HASH_COLUMN}) DO NOTHING""")
+        inserted = cur.rowcount
+    conn.commit()
+    return inserted
+
+
+def ingest(conn, path: str, corpus: str = "qa", chunk_size: int = CHUNK_SIZE,
+           method: str = "copy", drop_duplicates: bool = False) -> dict:
+    """Load `path` into the table of `corpus` and return the import counters."""
+    table, columns, required = CORPORA[corpus]
+    prepare_table(conn, table, columns, drop_duplicates)
+
+    stats = {"read": 0, "inserted": 0, "skipped": 0, "failed": 0}
+    start_time = time.perf_counter()
+    for total, chunk in read_chunks(path, columns, required, chunk_size):
+        stats["read"] += total
+        try:
+            inserted = load_chunk(conn, table, columns, chunk, method)
+        except Exception as e:  # pylint: disable=broad-except
+            conn.rollback()
+            stats["failed"] += len(chunk)
+            print(f"Erreur d'insertion du bloc (lignes {stats['read'] - total + 1}"
+                  f"-{stats['read']}) : {e}")
+            continue
+        stats["inserted"] += inserted
+        stats["skipped"] += total - inserted
+        elapsed = time.perf_counter() - start_time
+        print(f"{table}: {stats['read']} lignes lues, {stats['inserted']} insérées "
+              f"({stats['read'] / elapsed:.0f} lignes/s)")
+
+    stats["seconds"] = round(time.perf_counter() - start_time, 2)
+    return stats
 
-# Connexion à la base de données PostgreSQL
-conn = psycopg2.connect(
-    dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST, port=DB_PORT
-)
-cursor = conn.cursor()
 
-# Charger le CSV correctement en UTF-8
-df = pd.read_csv("C:/Users/Aycha/Desktop/dataset_utf8.csv", encoding="utf-8")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk, idempotent CSV import.")
+    parser.add_argument("csv")
+    parser.add_argument("--corpus", choices=tuple(CORPORA), default="qa")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--method", choices=("copy", "values"), default="copy")
+    parser.add_argument("--drop-duplicates", action="store_true",
+                        help="remove rows already duplicated in the table")
+    args = parser.parse_args()
 
-# Insérer ligne par ligne
-for _, row in df.iterrows():
+    connection = connect_db()
     try:
-        cursor.execute(
-            """INSERT INTO ae_qa_table 
-            (question, answer, source, focus_area) VALUES (%s, %s, %s, %s)""",
-            (row["question"], row["answer"], row["source"], row["focus_area"])
-        )
-    except Exception as e:
-        print(f"Erreur d'insertion pour la ligne : {row}")
-        print(e)
-
-# Valider et fermer la connexion
-conn.commit()
-cursor.close()
-conn.close()
-
-print("Import terminé avec succès !")
+        result = ingest(connection, args.csv, args.corpus, args.chunk_size,
+                        args.method, args.drop_duplicates)
+    finally:
+        connection.close()
+    rate = result["read"] / result["seconds"] if result["seconds"] else 0.0
+    print(f"Import terminé : {result['inserted']} lignes insérées, {result['skipped']} "
+          f"ignorées (doublons ou vides), {result['failed']} en erreur, "
+          f"{result['seconds']} s ({rate:.0f} lignes/s)")
@@ -0,0 +1,106 @@
+""" this module provides the lexical side of hybrid retrieval:
+    - BM25Index: an in-memory BM25 inverted index whose postings are three
+      flat NumPy arrays (CSR layout: per-term offsets, document ids and
+      precomputed BM25 weights), so scoring a query is a few vectorised adds;
+    - reciprocal_rank_fusion: merges several rankings (dense, lexical).
+    """
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Sequence, Tuple
+import numpy as np
+
+TOKEN = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = frozenset("""
+    a an and are as at be by can do does for from has have how i if in is it
+    its of on or should that the their there these this to was what when
+    where which who why will with you your
+    """.split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords ("Galloway-Mowat" -> galloway, mowat)."""
+    return [token for token in TOKEN.findall((text or "").lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of documents."""
+
+    def __init__(self, documents: Sequence[str], k1: float = 1.5, b: float = 0.75) -> None:
+        self.vocabulary: Dict[str, int] = {}
+        term_ids, doc_ids, freqs = [], [], []
+        lengths = np.zeros(len(documents), dtype=np.float32)
+        for doc_id, text in enumerate(documents):
+            counts = Counter(tokenize(text))
+            lengths[doc_id] = sum(counts.values())
+            for term, count in counts.items():
+                term_ids.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                doc_ids.append(doc_id)
+                freqs.append(count)
+
+        term_ids = np.asarray(term_ids, dtype=np.int32)
+        order = np.argsort(term_ids, kind="stable")
+        term_ids = term_ids[order]
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int32)[order]
+        freqs = np.asarray(freqs, dtype=np.float32)[order]
+
+        document_freqs = np.bincount(term_ids, minlength=len(self.vocabulary))
+        self.offsets = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(document_freqs, out=self.offsets[1:])
+        self.idf = np.log1p((len(documents) - document_freqs + 0.5) / (document_freqs + 0.5))
+
+        # Poids BM25 de chaque posting calculés une fois pour toutes
+        average_length = float(lengths.mean()) if len(documents) else 1.0
+        length_norm = k1 * (1 - b + b * lengths[self.doc_ids] / max(average_length, 1.0))
+        self.weights = (self.idf[term_ids] * freqs * (k1 + 1)
+                        / (freqs + length_norm)).astype(np.float32)
+        self.size = len(documents)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every document for `query`."""
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            # Un document apparaît au plus une fois par terme : pas besoin de np.add.at
+            scores[self.doc_ids[start:end]] += self.weights[start:end]
+        return scores
+
+    def query_weight(self, query: str) -> float:
+        """Sum of the IDF of the query terms present in the corpus.
+
+        This is the score of an average-length document containing each of
+        those terms once, a reference to compare scores across queries and
+        corpus sizes.
+        """
+        term_ids = [self.vocabulary[term] for term in set(tokenize(query))
+                    if term in self.vocabulary]
+        return float(self.idf[term_ids].sum()) if term_ids else 0.0
+
+    def search(self, query: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Indices and scores of the k best documents with a positive score, best first."""
+        scores = self.scores(query)
+        matching = int(np.count_nonzero(scores))
+        k = min(k, matching)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return top.astype(np.int64), scores[top]
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[int]],
+                           k: int = 60) -> Tuple[np.ndarray, np.ndarray]:
+    """Fuse rankings with RRF: sum of 1 / (k + rank) over the lists a document is in."""
+    fused = Counter()
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            if doc_id >= 0:
+                fused[int(doc_id)] += 1.0 / (k + rank + 1)
+    ordered = fused.most_common()
+    return (np.asarray([doc_id for doc_id, _ in ordered], dtype=np.int64),
+            np.asarray([score for _, score in ordered], dtype=np.float32))
@@ -0,0 +1,91 @@
+""" this module answers medication questions from the fields stored in
+    ae_med_table (indication, side effects, interactions, dosage) rendered
+    through a template, instead of asking Gemini to describe the drug.
+
+    Gemini is only used to translate the rendered answer when the requested
+    language is not English. Answers are cached per (drug, language).
+    """
+import ast
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+from config import MEDICATION_CACHE_SIZE
+
+SECTIONS = (
+    ("indication", "Indication"),
+    ("side_effects", "Side effects"),
+    ("drug_interaction", "Drug interactions"),
+    ("dosage", "Dosage"),
+)
+ENGLISH = ("english", "en", "anglais")
+
+
+def _format_field(value: str) -> str:
+    """Render a stored field; some rows hold a Python list serialised as text."""
+    value = " ".join(str(value).split())
+    if value.startswith("[") and value.endswith("]"):
+        try:
+            items = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return value
+        if isinstance(items, (list, tuple)):
+            return "\n".join(f"- {item}" for item in items)
+    return value
+
+
+def render_medication(record: dict) -> Optional[str]:
+    """Markdown answer for a drug record, or None when it has no usable fields."""
+    sections = [f"**{title}:**\n{_format_field(record[field])}"
+                for field, title in SECTIONS
+                if record.get(field) and str(record[field]).strip().lower() != "nan"]
+    if not sections:
+        return None
+    return f"**{record['drug']}**\n\n" + "\n\n".join(sections)
+
+
+class MedicationAnswers:
+    """Template answers from stored drug records, cached per (drug, language).
+
+    `lookup(drug)` returns the ae_med_table record of a drug or None, and is
+    run through `run_blocking`; `translate(text, language)` is awaited for
+    non-English answers.
+    """
+
+    def __init__(self, lookup: Callable[[str], Optional[dict]],
+                 translate: Callable[[str, str], Awaitable[str]],
+                 run_blocking: Callable[..., Awaitable],
+                 cache_size: int = MEDICATION_CACHE_SIZE) -> None:
+        self.lookup = lookup
+        self.translate = translate
+        self.run_blocking = run_blocking
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "rendered": 0, "not_found": 0}
+
+    async def get(self, drug: str, language: str) -> Optional[str]:
+        """Answer for `drug` in `language`, or None when the table can't answer."""
+        key = (drug.strip().lower(), language.strip().lower())
+        with self._lock:
+            answer = self._cache.get(key)
+            if answer is not None:
+                self._cache.move_to_end(key)
+                self.stats["hits"] += 1
+                return answer
+
+        record = await self.run_blocking(self.lookup, drug)
+        answer = render_medication(record) if record else None
+        if answer is None:
+            self.stats["not_found"] += 1
+            return None
+        if key[1] not in ENGLISH:
+            answer = await self.translate(answer, language)
+        self.stats["rendered"] += 1
+
+        if self.cache_size:
+            with self._lock:
+                self._cache[key] = answer
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return answer
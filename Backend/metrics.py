@@ -0,0 +1,192 @@
+""" this module measures where the latency of a request goes.
+
+    `stage(name)` times a block (embed, retrieve, llm, ocr...) into a
+    per-stage histogram and into the breakdown of the current request;
+    `TimingMiddleware` times each request per endpoint, gives it a trace id
+    and returns the breakdown in a `Server-Timing` header. `render()`
+    exposes everything in the Prometheus text format: cumulative
+    histograms, plus p50/p95/p99 over the last METRICS_WINDOW samples.
+    """
+import bisect
+import contextvars
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+import numpy as np
+from starlette.datastructures import MutableHeaders
+from config import METRICS_WINDOW, TIMING_HEADERS
+
+# Bornes des buckets (secondes), de 1 ms à 60 s
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUANTILES = (0.5, 0.95, 0.99)
+TRACE_HEADER = "x-trace-id"
+CLOUD_TRACE_HEADER = "x-cloud-trace-context"  # ajouté par le load balancer GCP
+
+_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = \
+    contextvars.ContextVar("request_timings", default=None)
+_trace_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("trace_id", default=None)
+
+
+class LatencyHistogram:
+    """Cumulative buckets, sum and count, plus a window of recent samples for quantiles."""
+
+    def __init__(self, window: int = METRICS_WINDOW) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        """Record one duration."""
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+        self.recent.append(seconds)
+
+    def quantiles(self) -> Dict[float, float]:
+        """p50/p95/p99 of the recent window, in seconds."""
+        if not self.recent:
+            return {}
+        values = np.percentile(np.fromiter(self.recent, dtype=float),
+                               [q * 100 for q in QUANTILES])
+        return dict(zip(QUANTILES, values.tolist()))
+
+
+class Metrics:
+    """Latency histograms keyed by (metric, label value)."""
+
+    def __init__(self) -> None:
+        self._histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, metric: str, label: str, seconds: float) -> None:
+        """Record a duration of `metric` for `label` (a stage or an endpoint)."""
+        with self._lock:
+            histogram = self._histograms.get((metric, label))
+            if histogram is None:
+                histogram = self._histograms[(metric, label)] = LatencyHistogram()
+            histogram.observe(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, dict]]:
+        """Count, mean and p50/p95/p99 in milliseconds, per metric and label."""
+        with self._lock:
+            items = sorted(self._histograms.items())
+            result = {}
+            for (metric, label), histogram in items:
+                result.setdefault(metric, {})[label] = {
+                    "count": histogram.count,
+                    "mean_ms": round(1000 * histogram.total / histogram.count, 3),
+                    **{f"p{int(q * 100)}_ms": round(1000 * value, 3)
+                       for q, value in histogram.quantiles().items()},
+                }
+        return result
+
+    def render(self) -> str:
+        """Prometheus text exposition of every histogram."""
+        label_names = {"stage": "stage", "request": "endpoint"}
+        lines = []
+        with self._lock:
+            for metric in sorted({metric for metric, _ in self._histograms}):
+                name = f"genai_{metric}_duration_seconds"
+                label_name = label_names.get(metric, "label")
+                entries = sorted((label, histogram) for (m, label), histogram
+                                 in self._histograms.items() if m == metric)
+                lines += [f"# HELP {name} Latency per {label_name}.",
+                          f"# TYPE {name} histogram"]
+                for label, histogram in entries:
+                    cumulative = 0
+                    for bound, count in zip((*BUCKETS, "+Inf"), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{label_name}="{label}",le="{bound}"}} '
+                                     f"{cumulative}")
+                    lines.append(f'{name}_sum{{{label_name}="{label}"}} {histogram.total:.6f}')
+                    lines.append(f'{name}_count{{{label_name}="{label}"}} {histogram.count}')
+                lines += [f"# HELP {name}_recent Quantiles over the last samples.",
+                          f"# TYPE {name}_recent summary"]
+                for label, histogram in entries:
+                    for q, value in histogram.quantiles().items():
+                        lines.append(f'{name}_recent{{{label_name}="{label}",quantile="{q}"}} '
+                                     f"{value:.6f}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as stage `name`, in the histograms and the current request's breakdown.
+
+    Works around awaits too; concurrent blocks of the same stage within a
+    request (e.g. one OCR per image) add up in the breakdown.
+    """
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start_time
+        metrics.observe("stage", name, elapsed)
+        timings = _timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed
+
+
+def current_timings() -> Dict[str, float]:
+    """Stage durations (ms) of the current request so far."""
+    return {name: round(1000 * seconds, 2) for name, seconds in (_timings.get() or {}).items()}
+
+
+def current_trace_id() -> Optional[str]:
+    """Trace id of the current request, for logs."""
+    return _trace_id.get()
+
+
+def _server_timing(timings: Dict[str, float], total: float) -> str:
+    parts = [f"{name};dur={1000 * seconds:.1f}" for name, seconds in timings.items()]
+    return ", ".join([*parts, f"total;dur={1000 * total:.1f}"])
+
+
+class TimingMiddleware:
+    """ASGI middleware timing each request and returning its stage breakdown.
+
+    The trace id comes from `X-Trace-Id` or the GCP `X-Cloud-Trace-Context`
+    header, or is generated; it is echoed back with a `Server-Timing` header
+    (stages finished before the response starts) when TIMING_HEADERS is on.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        trace_id = (headers.get(TRACE_HEADER.encode()) or
+                    headers.get(CLOUD_TRACE_HEADER.encode(), b"").split(b"/")[0]).decode() \
+            or uuid.uuid4().hex
+        timings: Dict[str, float] = {}
+        timings_token, trace_token = _timings.set(timings), _trace_id.set(trace_id)
+        start_time = time.perf_counter()
+
+        async def send_with_timing(message) -> None:
+            if message["type"] == "http.response.start" and TIMING_HEADERS:
+                response_headers = MutableHeaders(scope=message)
+                response_headers.append("X-Trace-Id", trace_id)
+                response_headers.append(
+                    "Server-Timing", _server_timing(timings, time.perf_counter() - start_time))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            route = scope.get("route")
+            metrics.observe("request", getattr(route, "path", "unmatched"),
+                            time.perf_counter() - start_time)
+            _timings.reset(timings_token)
+            _trace_id.reset(trace_token)
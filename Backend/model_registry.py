@@ -0,0 +1,67 @@
+""" this module loads the heavy models (query encoder, TrOCR, Gemini client)
+    on first use instead of at import time.
+
+    Each model is registered with a loader; `get` runs it once, under a
+    per-model lock, and later calls return the cached instance. `warm_up`
+    loads a list of models from a background thread so a server can accept
+    connections while they load, and `status` feeds the readiness endpoint.
+    """
+import threading
+import time
+from typing import Callable, Dict, Iterable
+
+
+class ModelRegistry:
+    """Thread-safe registry of lazily loaded models."""
+
+    def __init__(self) -> None:
+        self._loaders: Dict[str, Callable] = {}
+        self._models: Dict[str, object] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._states: Dict[str, dict] = {}
+
+    def register(self, name: str, loader: Callable) -> None:
+        """Declare a model; `loader()` is only called by the first `get(name)`."""
+        self._loaders[name] = loader
+        self._locks[name] = threading.Lock()
+        self._states[name] = {"state": "not_loaded"}
+
+    def get(self, name: str):
+        """Return the model, loading it on first use (concurrent callers wait)."""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        with self._locks[name]:
+            if name not in self._models:
+                self._states[name] = {"state": "loading"}
+                start_time = time.perf_counter()
+                try:
+                    self._models[name] = self._loaders[name]()
+                except Exception as e:
+                    self._states[name] = {"state": "error", "error": str(e)}
+                    raise
+                self._states[name] = {
+                    "state": "ready",
+                    "load_seconds": round(time.perf_counter() - start_time, 2)}
+            return self._models[name]
+
+    def is_loaded(self, name: str) -> bool:
+        """True once `name` has been loaded successfully."""
+        return name in self._models
+
+    def warm_up(self, names: Iterable[str]) -> threading.Thread:
+        """Load `names` one after another in a daemon thread."""
+        def load_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:  # pylint: disable=broad-except
+                    print(f"Erreur lors du chargement du modèle {name} : {e}")
+
+        thread = threading.Thread(target=load_all, daemon=True, name="model-warmup")
+        thread.start()
+        return thread
+
+    def status(self) -> Dict[str, dict]:
+        """Load state of every registered model."""
+        return {name: dict(state) for name, state in self._states.items()}
@@ -0,0 +1,115 @@
+""" this module resolves OCR'd medication names against the closed list of
+    drug names of ae_med_table, without calling the LLM.
+
+    Names are normalised (case, accents, punctuation, dosage tokens and the
+    usual OCR digit/letter confusions), indexed by character trigrams, and
+    the best trigram candidates are rescored with an edit-distance ratio.
+    A confidence below NAME_RESOLVER_THRESHOLD means the caller should fall
+    back to the Gemini correction.
+    """
+import re
+import unicodedata
+from collections import defaultdict
+from difflib import SequenceMatcher
+from typing import Iterable, List, NamedTuple, Optional
+import numpy as np
+from config import NAME_RESOLVER_THRESHOLD
+
+CANDIDATES = 20
+# Part du score perdue quand le nom ne couvre qu'une partie du texte lu
+UNMATCHED_PENALTY = 0.25
+# Confusions OCR fréquentes, appliquées au nom indexé comme au texte lu
+OCR_FOLDING = str.maketrans({"0": "o", "1": "l", "5": "s", "8": "b", "|": "l"})
+DOSAGE_TOKEN = re.compile(r"^\d+([.,]\d+)?(mg|g|ml|mcg|ug|ui|iu)$")
+
+
+class Resolution(NamedTuple):
+    """Best drug name for a text, its confidence in [0, 1] and whether it passes the threshold."""
+    name: Optional[str]
+    confidence: float
+    accepted: bool
+
+
+def normalize_name(text: str) -> str:
+    """Lowercase, strip accents and punctuation, drop dosages, fold OCR confusions."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char)).lower()
+    tokens = re.sub(r"[^0-9a-z|]+", " ", text).split()
+    tokens = [token.translate(OCR_FOLDING) if re.search("[a-z]", token) else token
+              for token in tokens if not DOSAGE_TOKEN.match(token)]
+    return " ".join(tokens)
+
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameResolver:
+    """Trigram + edit-distance index over a closed vocabulary of drug names."""
+
+    def __init__(self, names: Iterable[str], threshold: float = NAME_RESOLVER_THRESHOLD) -> None:
+        self.threshold = threshold
+        self.names: List[str] = []
+        self.keys: List[str] = []
+        self._exact = {}
+        postings = defaultdict(list)
+        for name in names:
+            key = normalize_name(name or "")
+            if not key or key in self._exact:
+                continue
+            self._exact[key] = len(self.names)
+            for trigram in _trigrams(key):
+                postings[trigram].append(len(self.names))
+            self.names.append(name)
+            self.keys.append(key)
+        self._postings = {trigram: np.asarray(ids, dtype=np.int32)
+                          for trigram, ids in postings.items()}
+        self._trigram_counts = np.array([len(_trigrams(key)) for key in self.keys],
+                                        dtype=np.float32)
+        self._word_counts = [len(key.split()) for key in self.keys]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def resolve(self, text: str) -> Resolution:
+        """Return the closest drug name to `text`."""
+        query = normalize_name(text or "")
+        if not query or not self.names:
+            return Resolution(None, 0.0, False)
+        exact = self._exact.get(query)
+        if exact is not None:
+            return Resolution(self.names[exact], 1.0, True)
+
+        # Candidats : noms partageant le plus de trigrammes (coefficient de Dice)
+        query_trigrams = _trigrams(query)
+        hits = [self._postings[t] for t in query_trigrams if t in self._postings]
+        if not hits:
+            return Resolution(None, 0.0, False)
+        shared = np.bincount(np.concatenate(hits), minlength=len(self.names))
+        dice = 2 * shared / (self._trigram_counts + len(query_trigrams))
+        count = min(CANDIDATES, int(np.count_nonzero(shared)))
+        candidates = np.argpartition(-dice, count - 1)[:count]
+        candidates = candidates[np.argsort(-dice[candidates])]
+
+        # Le texte OCR contient parfois d'autres mots (laboratoire, forme) :
+        # chaque nom est aussi comparé aux fenêtres de mots de même longueur,
+        # avec une pénalité pour la part du texte qu'il n'explique pas
+        words = query.split()
+        best, confidence = None, 0.0
+        for index in candidates:
+            key = self.keys[index]
+            width = self._word_counts[index]
+            windows = {query} | {" ".join(words[i:i + width])
+                                 for i in range(max(1, len(words) - width + 1))}
+            for window in windows:
+                coverage = 1.0 - UNMATCHED_PENALTY * (1.0 - len(window) / len(query))
+                matcher = SequenceMatcher(None, key, window, autojunk=False)
+                # Bornes supérieures bon marché avant le calcul exact
+                if (matcher.real_quick_ratio() * coverage <= confidence
+                        or matcher.quick_ratio() * coverage <= confidence):
+                    continue
+                score = matcher.ratio() * coverage
+                if score > confidence:
+                    best, confidence = self.names[index], score
+        return Resolution(best, round(confidence, 4), confidence >= self.threshold)
@@ -0,0 +1,159 @@
+""" this module runs the TrOCR pipeline of the medication endpoints:
+    - uploads are decoded from bytes, never written to disk;
+    - decoding, resizing and normalisation run in a process pool;
+    - a batcher thread gathers the images prepared within a few
+      milliseconds of each other and recognises them in one `generate` call;
+    - at most OCR_QUEUE_SIZE images are in flight, extra ones are refused.
+    The API awaits `aextract`, so the event loop never runs the model.
+    """
+import asyncio
+import io
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import (Future, InvalidStateError, ProcessPoolExecutor,
+                                ThreadPoolExecutor)
+from functools import partial
+from typing import Callable, List, Optional
+import numpy as np
+from PIL import Image
+from config import OCR_MAX_BATCH, OCR_BATCH_WAIT_MS, OCR_QUEUE_SIZE, OCR_PREPROCESS_WORKERS
+
+# Paramètres du preprocessor de microsoft/trocr-base-printed (ViTImageProcessor)
+IMAGE_SIZE = 384
+IMAGE_MEAN = 0.5
+IMAGE_STD = 0.5
+
+
+class OcrQueueFull(Exception):
+    """Raised when OCR_QUEUE_SIZE images are already waiting."""
+
+
+def preprocess_image(data: bytes) -> np.ndarray:
+    """Decode an encoded image and return TrOCR pixel values, shape (3, H, W)."""
+    image = Image.open(io.BytesIO(data)).convert("RGB")
+    image = image.resize((IMAGE_SIZE, IMAGE_SIZE), Image.BILINEAR)
+    pixels = np.asarray(image, dtype=np.float32) / 255.0
+    pixels = (pixels - IMAGE_MEAN) / IMAGE_STD
+    return np.ascontiguousarray(pixels.transpose(2, 0, 1))
+
+
+class OcrService:
+    """Bounded, micro-batched access to a `recognize(pixel_batch) -> texts` function."""
+
+    def __init__(self, recognize: Callable[[np.ndarray], List[str]],
+                 max_batch_size: int = OCR_MAX_BATCH,
+                 max_wait_ms: float = OCR_BATCH_WAIT_MS,
+                 max_pending: int = OCR_QUEUE_SIZE,
+                 preprocess_workers: int = OCR_PREPROCESS_WORKERS) -> None:
+        self.recognize = recognize
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.preprocess_workers = preprocess_workers
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self._queue = queue.Queue()
+        self._pool = None
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.stats = {"images": 0, "batches": 0, "rejected": 0}
+
+    def submit(self, data: bytes) -> Future:
+        """Queue one encoded image; the future resolves to its text."""
+        if not self._pending.acquire(blocking=False):
+            self.stats["rejected"] += 1
+            raise OcrQueueFull("Too many images waiting for OCR.")
+        result = Future()
+        result.add_done_callback(lambda _: self._pending.release())
+        try:
+            self._start()
+            prepared = self._pool.submit(preprocess_image, data)
+        except Exception as e:  # pylint: disable=broad-except
+            # Pool cassé ou arrêté : on résout le future pour rendre la place
+            result.set_exception(e)
+            return result
+        prepared.add_done_callback(partial(self._enqueue, result))
+        return result
+
+    def extract(self, data: bytes) -> str:
+        """Text of one encoded image (blocking)."""
+        return self.submit(data).result()
+
+    async def aextract(self, data: bytes) -> str:
+        """Text of one encoded image, awaited without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(data))
+
+    def _start(self) -> None:
+        """Create the preprocessing pool and the batcher thread on first use."""
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is not None:
+                return
+            if self.preprocess_workers:
+                # spawn : un fork après le chargement de torch n'est pas sûr
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.preprocess_workers,
+                    mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ocr-preprocess")
+            self._worker = threading.Thread(target=self._run, daemon=True, name="ocr-batcher")
+            self._worker.start()
+
+    def _enqueue(self, result: Future, prepared: Future) -> None:
+        error = prepared.exception()
+        if error is not None:
+            _resolve(result, error=error)
+        else:
+            self._queue.put((prepared.result(), result))
+
+    def _run(self) -> None:
+        """Worker loop: wait for an image, gather more for up to max_wait, recognise."""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            # Requêtes annulées entre-temps : leurs images ne sont pas reconnues
+            batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                self._recognize_batch(batch)
+            except Exception as e:  # pylint: disable=broad-except
+                # Un lot en échec ne doit pas arrêter le thread
+                print(f"Erreur du batch OCR : {e}")
+                for _, future in batch:
+                    _resolve(future, error=e)
+
+    def _recognize_batch(self, batch: list) -> None:
+        try:
+            texts = self.recognize(np.stack([pixels for pixels, _ in batch]))
+        except Exception as e:  # pylint: disable=broad-except
+            for _, future in batch:
+                _resolve(future, error=e)
+            return
+
+        self.stats["batches"] += 1
+        self.stats["images"] += len(batch)
+        for (_, future), text in zip(batch, texts):
+            _resolve(future, text)
+
+
+def _resolve(future: Future, result=None, error: Optional[BaseException] = None) -> None:
+    """Set the outcome of `future` unless it is already done (e.g. cancelled)."""
+    if future.done():
+        return
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass  # annulé entre le test et l'affectation
@@ -0,0 +1,135 @@
+""" this module provides an ONNX Runtime version of the query encoder
+    (EMBEDDING_MODEL, a mean-pooled sentence-transformers model), optionally
+    with dynamic int8 quantization, as a CPU alternative to the PyTorch
+    SentenceTransformer.
+
+    Export (from the Backend directory, needs torch once):
+        python onnx_encoder.py --quantize
+        python onnx_encoder.py --model BAAI/bge-small-en-v1.5 --output-dir models/bge-onnx
+    then set ENCODER_BACKEND=onnx or ENCODER_BACKEND=onnx-int8. The model id
+    and dimension are written to encoder.json next to the ONNX files.
+    """
+import argparse
+import json
+import os
+from typing import List, Optional, Union
+import numpy as np
+from transformers import AutoTokenizer
+from config import ONNX_MODEL_DIR, EMBEDDING_MODEL
+
+MAX_SEQ_LENGTH = 384  # valeur de SentenceTransformer pour all-mpnet-base-v2
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model-int8.onnx"
+METADATA_FILE = "encoder.json"
+# Exports antérieurs à encoder.json : toujours all-mpnet-base-v2
+LEGACY_EXPORT = {"model": "sentence-transformers/all-mpnet-base-v2", "dim": 768}
+
+
+def read_metadata(model_dir: str) -> dict:
+    """Model id and dimension of an ONNX export."""
+    path = os.path.join(model_dir, METADATA_FILE)
+    if not os.path.exists(path):
+        return dict(LEGACY_EXPORT)
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+class OnnxEncoder:
+    """Mean-pooled sentence embeddings computed with ONNX Runtime.
+
+    `encode` mirrors the subset of SentenceTransformer.encode used in this
+    project, so it can replace the torch model transparently. With
+    `model_name`, an export of another model is refused (ValueError), so
+    queries are never encoded by a model other than the one configured.
+    """
+
+    def __init__(self, model_dir: str = ONNX_MODEL_DIR, quantized: bool = False,
+                 threads: int = 0, model_name: Optional[str] = None) -> None:
+        import onnxruntime  # pylint: disable=import-outside-toplevel
+
+        metadata = read_metadata(model_dir)
+        if model_name is not None and metadata["model"] != model_name:
+            raise ValueError(f"{model_dir} contient {metadata['model']}, {model_name} attendu : "
+                             f"relancer onnx_encoder.py --model {model_name}")
+        self.model_name, self.dim = metadata["model"], metadata["dim"]
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        model_file = QUANTIZED_MODEL_FILE if quantized else MODEL_FILE
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, model_file), options,
+            providers=["CPUExecutionProvider"])
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32,
+               normalize_embeddings: bool = False) -> np.ndarray:
+        """Embed one sentence (1-d result) or a list of sentences (2-d result)."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        outputs = []
+        for start in range(0, len(texts), batch_size):
+            tokens = self.tokenizer(
+                texts[start:start + batch_size], padding=True, truncation=True,
+                max_length=MAX_SEQ_LENGTH, return_tensors="np")
+            mask = tokens["attention_mask"].astype(np.int64)
+            hidden = self.session.run(None, {
+                "input_ids": tokens["input_ids"].astype(np.int64),
+                "attention_mask": mask,
+            })[0]
+            # Mean pooling sur les tokens réels, comme SentenceTransformer
+            weights = mask[..., None].astype(np.float32)
+            pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+            outputs.append(pooled)
+
+        embeddings = np.concatenate(outputs) if outputs else np.empty((0, self.dim), np.float32)
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.clip(norms, 1e-12, None)
+        return embeddings[0] if single else embeddings
+
+
+def export(output_dir: str = ONNX_MODEL_DIR, quantize: bool = False,
+           model_name: str = EMBEDDING_MODEL) -> None:
+    """Export the transformer of `model_name` to ONNX, and optionally a dynamic int8 copy."""
+    # pylint: disable=import-outside-toplevel
+    import torch
+    from transformers import AutoModel
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    dummy = tokenizer(["What are the symptoms of diabetes ?"], return_tensors="pt")
+
+    model_path = os.path.join(output_dir, MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model, (dummy["input_ids"], dummy["attention_mask"]), model_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={name: {0: "batch", 1: "sequence"} for name in
+                          ("input_ids", "attention_mask", "last_hidden_state")},
+            opset_version=14)
+    tokenizer.save_pretrained(output_dir)
+    with open(os.path.join(output_dir, METADATA_FILE), "w", encoding="utf-8") as file:
+        json.dump({"model": model_name, "dim": model.config.hidden_size}, file)
+    print(f"Modèle ONNX exporté : {model_path} ({model_name})")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized_path = os.path.join(output_dir, QUANTIZED_MODEL_FILE)
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        print(f"Modèle int8 exporté : {quantized_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the query encoder to ONNX.")
+    parser.add_argument("--model", default=EMBEDDING_MODEL,
+                        help="sentence-transformers model to export (mean pooling)")
+    parser.add_argument("--output-dir", default=ONNX_MODEL_DIR)
+    parser.add_argument("--quantize", action="store_true",
+                        help="also write a dynamically quantized int8 model")
+    args = parser.parse_args()
+    export(args.output_dir, args.quantize, args.model)
@@ -0,0 +1,117 @@
+""" this module runs similarity search inside PostgreSQL with pgvector,
+    so only the top-k rows leave the database, and migrates a JSON-text
+    embedding column `<column>` to a native `vector` column `<column>_vec`.
+
+    Migration (from the Backend directory):
+        python pgvector_store.py ae_qa_table --index hnsw
+        python pgvector_store.py ae_med_table --index ivfflat --column embedding
+    """
+import argparse
+import math
+from typing import List, Sequence
+from config import (TABLE_NAME, EMBEDDING_DIM, PGVECTOR_INDEX,
+                    ANN_NPROBE, ANN_EF_SEARCH, ANN_HNSW_M, ANN_EF_CONSTRUCTION)
+from embedding_versions import LEGACY_COLUMN, vector_column
+from db_pool import db_pool
+
+VECTOR_COLUMN = vector_column(LEGACY_COLUMN)
+MIGRATION_BATCH_SIZE = 5000
+
+
+def to_vector_literal(embedding: Sequence[float]) -> str:
+    """Format an embedding as a pgvector text literal ('[x1,x2,...]')."""
+    return "[" + ",".join(f"{float(x):.7g}" for x in embedding) + "]"
+
+
+def search(conn, table: str, columns: Sequence[str], query_embedding: Sequence[float],
+           k: int, threshold: float, source: str = LEGACY_COLUMN) -> List[dict]:
+    """Return the k nearest rows by cosine distance, computed server-side.
+
+    Rows below `threshold` cosine similarity are dropped, and each result
+    carries its `similarity` like the in-memory index does. `source` is the
+    embedding column whose pgvector copy is searched.
+    """
+    vector = to_vector_literal(query_embedding)
+    column = vector_column(source)
+    with conn.cursor() as cur:
+        # Réglages de rappel propres à la transaction en cours
+        if PGVECTOR_INDEX == "ivfflat":
+            cur.execute("SET LOCAL ivfflat.probes = %s", (ANN_NPROBE,))
+        else:
+            cur.execute("SET LOCAL hnsw.ef_search = %s", (ANN_EF_SEARCH,))
+        # Requête préparée une fois par connexion du pool
+        db_pool.execute(
+            cur, f"""SELECT {", ".join(columns)},
+            1 - ({column} <=> %s::vector) AS similarity
+            FROM {table} WHERE {column} IS NOT NULL
+            ORDER BY {column} <=> %s::vector LIMIT %s""",
+            (vector, vector, k))
+        rows = cur.fetchall()
+    conn.rollback()
+
+    return [
+        {**dict(zip(columns, row[:-1])), "similarity": round(float(row[-1]), 4)}
+        for row in rows
+        if row[-1] >= threshold
+    ]
+
+
+def migrate(conn, table: str = TABLE_NAME, index_type: str = PGVECTOR_INDEX,
+            source: str = LEGACY_COLUMN, dim: int = EMBEDDING_DIM) -> None:
+    """Add the `vector` column, copy the JSON embeddings of `source` into it and index it.
+
+    The copy runs in batches and only touches rows not yet migrated, so it
+    can be interrupted and re-run while the API keeps serving.
+    """
+    column = vector_column(source)
+    with conn.cursor() as cur:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        cur.execute(
+            f"""ALTER TABLE {table} ADD COLUMN IF NOT EXISTS
+            {column} vector({dim})""")
+        conn.commit()
+
+        migrated = 0
+        while True:
+            # Le texte JSON '[0.1, 0.2, ...]' est directement lisible par pgvector
+            cur.execute(
+                f"""UPDATE {table} SET {column} = {source}::text::vector
+                WHERE id IN (SELECT id FROM {table}
+                             WHERE {source} IS NOT NULL
+                             AND {column} IS NULL LIMIT %s)""",
+                (MIGRATION_BATCH_SIZE,))
+            conn.commit()
+            if cur.rowcount == 0:
+                break
+            migrated += cur.rowcount
+            print(f"{table}: {migrated} embeddings migrés")
+
+        cur.execute(f"SELECT count(*) FROM {table} WHERE {column} IS NOT NULL")
+        count = cur.fetchone()[0]
+        if index_type == "ivfflat":
+            lists = max(1, int(math.sqrt(count)))
+            method = f"ivfflat ({column} vector_cosine_ops) WITH (lists = {lists})"
+        else:
+            method = (f"hnsw ({column} vector_cosine_ops) WITH "
+                      f"(m = {ANN_HNSW_M}, ef_construction = {ANN_EF_CONSTRUCTION})")
+        cur.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_{column}_{index_type}_idx "
+            f"ON {table} USING {method}")
+        conn.commit()
+        print(f"{table}: index {index_type} prêt sur {count} lignes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate embeddings to pgvector.")
+    parser.add_argument("table", nargs="?", default=TABLE_NAME)
+    parser.add_argument("--index", choices=("hnsw", "ivfflat"), default=PGVECTOR_INDEX)
+    parser.add_argument("--column", default=LEGACY_COLUMN, help="JSON embedding column")
+    parser.add_argument("--dim", type=int, default=EMBEDDING_DIM)
+    args = parser.parse_args()
+
+    from retrieve import connect_db  # pylint: disable=import-outside-toplevel
+    connection = connect_db()
+    try:
+        migrate(connection, args.table, args.index, args.column, args.dim)
+    finally:
+        connection.close()
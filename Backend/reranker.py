@@ -0,0 +1,110 @@
+""" this module re-ranks retrieval candidates with a cross-encoder.
+
+    The N candidates of a query are scored in one batched forward pass;
+    scores are cached per (query, document) so repeated questions only
+    score new documents. If scoring does not finish within the latency
+    budget, the candidates are returned in their retrieval order: a job
+    already running completes and fills the cache for the next time, a job
+    still queued is cancelled. With a budget, at most MAX_PENDING jobs are
+    in flight; further queries skip re-ranking instead of queueing.
+    """
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, List, Sequence, Tuple
+from config import RERANK_BUDGET_MS, RERANK_CACHE_SIZE
+from response_cache import normalize_question
+
+MAX_PENDING = 2  # un lot en cours de scoring + un en attente
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class Reranker:
+    """Cached cross-encoder re-ranking with a latency budget.
+
+    `score_pairs(pairs)` returns one relevance score per (query, document) pair.
+    """
+
+    def __init__(self, score_pairs: Callable[[List[Tuple[str, str]]], Sequence[float]],
+                 budget_ms: float = RERANK_BUDGET_MS,
+                 cache_size: int = RERANK_CACHE_SIZE) -> None:
+        self.score_pairs = score_pairs
+        self.budget = budget_ms / 1000 if budget_ms else None
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+        self._pending = 0
+        self.stats = {"reranked": 0, "over_budget": 0, "busy": 0, "cached_scores": 0,
+                      "scored": 0}
+
+    def _count(self, stat: str, amount: int = 1) -> None:
+        with self._lock:
+            self.stats[stat] += amount
+
+    def _job_done(self, _future) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def rerank(self, query: str, candidates: List[dict], text_field: str = "answer") -> List[dict]:
+        """Candidates sorted by cross-encoder score, each with a `rerank_score`."""
+        if len(candidates) < 2:
+            return candidates
+        query_key = _digest(normalize_question(query))
+        keys = [(query_key, _digest(str(c.get(text_field) or ""))) for c in candidates]
+
+        with self._lock:
+            scores = [self._cache.get(key) for key in keys]
+            for key, score in zip(keys, scores):
+                if score is not None:
+                    self._cache.move_to_end(key)
+            missing = [i for i, score in enumerate(scores) if score is None]
+            self.stats["cached_scores"] += len(candidates) - len(missing)
+            # File saturée : le lot attendrait au-delà du budget, on ne l'ajoute pas
+            busy = bool(missing) and self.budget is not None and self._pending >= MAX_PENDING
+            if missing and not busy:
+                self._pending += 1
+        if busy:
+            self._count("busy")
+            return candidates
+
+        if missing:
+            pairs = [(query, str(candidates[i].get(text_field) or "")) for i in missing]
+            try:
+                future = self._executor.submit(self._score, pairs, [keys[i] for i in missing])
+            except RuntimeError as e:
+                self._job_done(None)
+                print(f"Erreur lors du re-ranking : {e}")
+                return candidates
+            future.add_done_callback(self._job_done)
+            try:
+                computed = future.result(timeout=self.budget)
+            except FutureTimeout:
+                # Un lot pas encore démarré est abandonné ; un lot en cours finit et remplit le cache
+                future.cancel()
+                self._count("over_budget")
+                return candidates
+            except Exception as e:  # pylint: disable=broad-except
+                print(f"Erreur lors du re-ranking : {e}")
+                return candidates
+            for i, score in zip(missing, computed):
+                scores[i] = score
+
+        self._count("reranked")
+        order = sorted(range(len(candidates)), key=lambda i: scores[i], reverse=True)
+        return [{**candidates[i], "rerank_score": round(scores[i], 4)} for i in order]
+
+    def _score(self, pairs: List[Tuple[str, str]], keys: list) -> List[float]:
+        scores = [float(score) for score in self.score_pairs(pairs)]
+        with self._lock:
+            self.stats["scored"] += len(pairs)
+            if self.cache_size:
+                for key, score in zip(keys, scores):
+                    self._cache[key] = score
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return scores
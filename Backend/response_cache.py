@@ -0,0 +1,219 @@
+""" this module caches generated answers in front of the LLM call.
+
+    Two layers are checked in order:
+    - exact: normalised question + language + matched document;
+    - semantic: a cached query embedding, for the same language and
+      document, within RESPONSE_CACHE_THRESHOLD cosine similarity.
+    Entries are evicted LRU-first and after RESPONSE_CACHE_TTL seconds, and
+    can be persisted to SQLite (RESPONSE_CACHE_DB) to survive restarts.
+    Lookups and inserts only touch memory: SQLite writes are queued to a
+    writer thread that commits them in batches, off the event loop.
+    """
+import hashlib
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Sequence
+import numpy as np
+from config import (RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL,
+                    RESPONSE_CACHE_THRESHOLD, RESPONSE_CACHE_DB)
+
+WRITE_BATCH = 256  # écritures SQLite par commit au plus
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(re.sub(r"[^\w\s]", " ", question.lower()).split())
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Exact + semantic LRU/TTL cache of generated responses."""
+
+    def __init__(self, max_size: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL,
+                 threshold: float = RESPONSE_CACHE_THRESHOLD,
+                 db_path: str = RESPONSE_CACHE_DB) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        # key -> (slot, group, response, created_at), dans l'ordre LRU
+        self._entries = OrderedDict()
+        # key -> created_at, dans l'ordre d'insertion : l'expiration part du début
+        self._by_age = OrderedDict()
+        # Une ligne par slot : embedding normalisé de la question en cache,
+        # alloué à la première insertion (dimension du modèle d'embedding)
+        self._vectors: Optional[np.ndarray] = None
+        self._groups = np.full(max_size, "", dtype=object)
+        self._slot_keys = [None] * max_size
+        self._free_slots = list(range(max_size - 1, -1, -1))
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0}
+        self._db = self._open_db(db_path) if db_path and max_size else None
+        self._writes = queue.Queue()
+        if self._db is not None:
+            threading.Thread(target=self._write_loop, daemon=True,
+                             name="response-cache-db").start()
+
+    @property
+    def enabled(self) -> bool:
+        """False when RESPONSE_CACHE_SIZE is 0."""
+        return self.max_size > 0
+
+    def get(self, question: str, language: str, context: str,
+            query_embedding: Sequence[float]) -> Optional[str]:
+        """Return a cached response for this question/context, or None."""
+        if not self.enabled:
+            return None
+        group = _digest(language.lower(), context or "")
+        key = _digest(normalize_question(question), group)
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["exact_hits"] += 1
+                return entry[2]
+
+            key = self._nearest(group, query_embedding)
+            if key is not None:
+                self._entries.move_to_end(key)
+                self.stats["semantic_hits"] += 1
+                return self._entries[key][2]
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, question: str, language: str, context: str,
+            query_embedding: Sequence[float], response: str) -> None:
+        """Store a response, evicting the least recently used entry if full."""
+        if not self.enabled:
+            return
+        group = _digest(language.lower(), context or "")
+        key = _digest(normalize_question(question), group)
+        created_at = time.time()
+        vector = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        with self._lock:
+            if not self._accepts(vector):
+                return
+            if key in self._entries:
+                slot = self._entries.pop(key)[0]
+            else:
+                if not self._free_slots:
+                    self._evict(next(iter(self._entries)))
+                slot = self._free_slots.pop()
+            self._fill_slot(slot, key, group, vector / norm if norm else vector)
+            self._entries[key] = (slot, group, response, created_at)
+            self._by_age.pop(key, None)
+            self._by_age[key] = created_at
+            if self._db is not None:
+                self._writes.put(("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                                  (key, group, response, vector.tobytes(), created_at)))
+
+    def flush(self) -> None:
+        """Wait until every queued SQLite write is committed."""
+        if self._db is not None:
+            self._writes.join()
+
+    def snapshot_stats(self) -> dict:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            lookups = sum(self.stats[name] for name in ("exact_hits", "semantic_hits", "misses"))
+            hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+            return {**self.stats, "size": len(self._entries), "max_size": self.max_size,
+                    "hit_rate": round(hits / lookups, 4) if lookups else 0.0}
+
+    def _nearest(self, group: str, query_embedding: Sequence[float]) -> Optional[str]:
+        """Key of the most similar cached query of the same group above threshold."""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if not self._entries or not self._accepts(query):
+            return None
+        norm = np.linalg.norm(query)
+        if not norm:
+            return None
+        scores = self._vectors @ (query / norm)
+        scores[self._groups != group] = -1.0
+        slot = int(np.argmax(scores))
+        if scores[slot] < self.threshold:
+            return None
+        return self._slot_keys[slot]
+
+    def _accepts(self, vector: np.ndarray) -> bool:
+        """Allocate the vector store on first use; reject vectors of another dimension."""
+        if self._vectors is None:
+            self._vectors = np.zeros((self.max_size, len(vector)), dtype=np.float32)
+        return vector.shape == self._vectors.shape[1:]
+
+    def _fill_slot(self, slot: int, key: str, group: str, vector: np.ndarray) -> None:
+        self._vectors[slot] = vector
+        self._groups[slot] = group
+        self._slot_keys[slot] = key
+
+    def _expire(self) -> None:
+        """Drop entries older than the TTL, only visiting the expired ones."""
+        if not self.ttl:
+            return
+        deadline = time.time() - self.ttl
+        while self._by_age and next(iter(self._by_age.values())) < deadline:
+            self._evict(next(iter(self._by_age)))
+
+    def _evict(self, key: str) -> None:
+        slot, _, _, _ = self._entries.pop(key)
+        self._by_age.pop(key, None)
+        self._groups[slot] = ""
+        self._slot_keys[slot] = None
+        self._free_slots.append(slot)
+        self.stats["evictions"] += 1
+        if self._db is not None:
+            self._writes.put(("DELETE FROM responses WHERE key = ?", (key,)))
+
+    def _write_loop(self) -> None:
+        """Apply queued SQLite writes, one commit per batch."""
+        while True:
+            batch = [self._writes.get()]
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                for sql, params in batch:
+                    self._db.execute(sql, params)
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Erreur d'écriture du cache de réponses : {e}")
+            finally:
+                for _ in batch:
+                    self._writes.task_done()
+
+    def _open_db(self, db_path: str) -> sqlite3.Connection:
+        """Open the SQLite backing store and reload the most recent live entries."""
+        db = sqlite3.connect(db_path, check_same_thread=False)
+        db.execute("""CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY, grp TEXT, response TEXT,
+            embedding BLOB, created_at REAL)""")
+        if self.ttl:
+            db.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,))
+        rows = db.execute(
+            "SELECT key, grp, response, embedding, created_at FROM responses "
+            "ORDER BY created_at DESC LIMIT ?", (self.max_size,)).fetchall()
+        for key, group, response, embedding, created_at in reversed(rows):
+            vector = np.frombuffer(embedding, dtype=np.float32)
+            if not self._accepts(vector):
+                continue  # embedding d'un autre modèle
+            norm = np.linalg.norm(vector)
+            slot = self._free_slots.pop()
+            self._fill_slot(slot, key, group, vector / norm if norm else vector)
+            self._entries[key] = (slot, group, response, created_at)
+            self._by_age[key] = created_at
+        db.commit()
+        return db
+
+
+response_cache = ResponseCache()
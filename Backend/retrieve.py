@@ -2,125 +2,629 @@
     from the database and finding the best match for a given query embedding.
     """
 import json
-from functools import lru_cache
+import os
+import threading
+import time
+from contextlib import contextmanager
 from typing import List, Tuple, Optional
 import psycopg2
 import numpy as np
 from fastapi import HTTPException
-from sklearn.metrics.pairwise import cosine_similarity
-from config import TABLE_NAME, DB_USER, DB_NAME, DB_HOST, DB_PORT, DB_PASSWORD
+from config import (TABLE_NAME, DB_USER, DB_NAME, DB_HOST, DB_PORT, DB_PASSWORD,
+                    ANN_ENGINE, ANN_INDEX_DIR, SEARCH_MODE, EMBEDDING_FORMAT,
+                    SNAPSHOT_DIR, SNAPSHOT_POLL_SECONDS, CORPUS_REFRESH_SECONDS,
+                    RETRIEVAL_MODE, RRF_K, HYBRID_CANDIDATES, HYBRID_MIN_BM25_RATIO)
+from ann import build_search
+from lexical import BM25Index, reciprocal_rank_fusion
+from embedding_versions import (EmbeddingVersion, EmbeddingVersionError, LEGACY_COLUMN,
+                                LEGACY_VERSION, QUERY_MODEL_TAG, binary_column,
+                                serving_version)
+from db_pool import db_pool, PoolTimeout
+import embedding_store
+import pgvector_store
+import snapshot
+
+SIMILARITY_THRESHOLD = 0.5
+QA_COLUMNS = ("answer", "source", "focus_area", "question")
+MED_TABLE = "ae_med_table"
+MED_COLUMNS = ("drug", "indication", "side_effects", "drug_interaction", "dosage")
+# Champs indexés par BM25 pour les modes de recherche lexical et hybrid
+QA_TEXT_FIELDS = ("question", "answer", "focus_area")
+MED_TEXT_FIELDS = ("drug", "indication")
 
 
 def connect_db():
-    """Establish a secure connection to PostgreSQL."""
+    """Open a dedicated connection to PostgreSQL.
+
+    For maintenance jobs (ingest, backfill, migrations) that need their own
+    session; request and cache code borrows from the pool with `db_connection`.
+    """
     try:
-        return psycopg2.connect(
-            dbname=DB_NAME.encode("utf-8").decode("utf-8"),
-            user=DB_USER.encode("utf-8").decode("utf-8"),
-            password=DB_PASSWORD.encode("utf-8").decode("utf-8"),
-            host=DB_HOST.encode("utf-8").decode("utf-8"),
-            port=DB_PORT.encode("utf-8").decode("utf-8")
-        )
+        return psycopg2.connect(dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD,
+                                host=DB_HOST, port=DB_PORT)
     except psycopg2.Error as e:
         raise HTTPException(
             status_code=500, detail=f"DB connection error: {str(e)}") from e
 
 
-@lru_cache(maxsize=1000)
-def get_all_embeddings() -> List[Tuple[str, str, str, List[float]]]:
-    """Retrieve cached embeddings from PostgreSQL to reduce query load."""
-    conn = connect_db()
+@contextmanager
+def db_connection(statement_timeout_ms: Optional[int] = None):
+    """Borrow a connection from the worker's pool (see `db_pool`).
+
+    `statement_timeout_ms=0` lifts the statement timeout, for full-table loads.
+    """
     try:
+        with db_pool.connection(statement_timeout_ms) as conn:
+            yield conn
+    except PoolTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e)) from e
+    except psycopg2.OperationalError as e:
+        raise HTTPException(
+            status_code=500, detail=f"DB connection error: {str(e)}") from e
+
+
+def get_all_embeddings(column: str = LEGACY_COLUMN) -> List[Tuple[str, str, str, str, List[float]]]:
+    """Retrieve all QA embeddings of `column` from PostgreSQL.
+
+    Not cached: callers should go through `get_qa_index`, which keeps a
+    single float32 copy of the corpus instead of the decoded Python lists.
+    """
+    with db_connection(statement_timeout_ms=0) as conn:
         with conn.cursor() as cur:
             cur.execute(
-                f"""SELECT answer, source, focus_area,
-                embedding FROM {TABLE_NAME} WHERE embedding IS NOT NULL""")
+                f"""SELECT answer, source, focus_area, question,
+                {column} FROM {TABLE_NAME} WHERE {column} IS NOT NULL""")
             rows = cur.fetchall()
 
         # Vérifier et convertir les embeddings valides uniquement
         cleaned_rows = []
         for row in rows:
             try:
-                embedding = json.loads(row[3]) if row[3] is not None else []
-                cleaned_rows.append((row[0], row[1], row[2], embedding))
+                embedding = json.loads(row[4]) if row[4] is not None else []
+                cleaned_rows.append((row[0], row[1], row[2], row[3], embedding))
             except json.JSONDecodeError:
                 print(f"Erreur de décodage JSON pour l'entrée : {row[0]}")
 
         return cleaned_rows
-    finally:
-        conn.close()
 
 
-def find_best_match(query_embedding: List[float]) -> Optional[dict]:
-    """Find the best match for the given query embedding."""
-    rows = get_all_embeddings()
-    if not rows:
-        return None
+class VectorIndex:
+    """In-memory cosine index over a contiguous float32 matrix.
+
+    Rows are L2-normalised once at build time, so an exact query is a single
+    matrix-vector product followed by `argpartition` for the top-k. The
+    `engine` selects an approximate FAISS backend instead (see `ann`).
+    Already-normalised matrices (e.g. a memory-mapped snapshot) are used
+    without copying. The BM25 index over `text_fields` used by the lexical
+    and hybrid modes is built on first use. `model_tag` names the embedding
+    model version of the matrix (see `embedding_versions`).
+    """
+
+    def __init__(self, rows: List[dict], embeddings, engine: str = "exact",
+                 index_path: Optional[str] = None, normalized: bool = False,
+                 text_fields: Tuple[str, ...] = (),
+                 model_tag: str = LEGACY_VERSION.tag) -> None:
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.size == 0:
+            matrix = matrix.reshape(0, 0)
+        if not normalized:
+            matrix = _normalize(matrix)
+        self.matrix = np.ascontiguousarray(matrix)
+        self.rows = rows
+        self.engine = engine
+        self.backend = build_search(self.matrix, engine, index_path)
+        self.text_fields = text_fields
+        self.model_tag = model_tag
+        self._lexical: Optional[BM25Index] = None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def search(self, query_embedding, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the indices and cosine scores of the k nearest rows, best first."""
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+        return self.backend.search(query, k)
+
+    def search_batch(self, query_embeddings, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Batched `search`: (n_queries, k) indices and scores, index -1 when missing."""
+        queries = _normalize(np.asarray(query_embeddings, dtype=np.float32))
+        k = min(k, len(self))
+        if k <= 0:
+            return (np.empty((len(queries), 0), dtype=np.int64),
+                    np.empty((len(queries), 0), dtype=np.float32))
+        return self.backend.search_batch(np.ascontiguousarray(queries), k)
+
+    def top_k_batch(self, query_embeddings, k: int = 5,
+                    threshold: float = SIMILARITY_THRESHOLD) -> List[List[dict]]:
+        """Batched `top_k`, one result list per query."""
+        indices, scores = self.search_batch(query_embeddings, k)
+        return [
+            [{**self.rows[i], "similarity": round(float(score), 4)}
+             for i, score in zip(row_indices, row_scores)
+             if i >= 0 and score >= threshold]
+            for row_indices, row_scores in zip(indices, scores)
+        ]
+
+    def top_k(self, query_embedding, k: int = 5,
+              threshold: float = SIMILARITY_THRESHOLD) -> List[dict]:
+        """Return the k best rows scoring at least `threshold`, with their similarity."""
+        indices, scores = self.search(query_embedding, k)
+        return [
+            {**self.rows[i], "similarity": round(float(score), 4)}
+            for i, score in zip(indices, scores)
+            if score >= threshold
+        ]
+
+    def lexical(self) -> BM25Index:
+        """BM25 index over the text fields of the rows, built on first use."""
+        if self._lexical is None:
+            self._lexical = BM25Index([
+                " ".join(str(row.get(field) or "") for field in self.text_fields)
+                for row in self.rows])
+        return self._lexical
+
+    def hybrid_top_k(self, query_text: str, query_embedding, k: int = 5,
+                     threshold: float = SIMILARITY_THRESHOLD,
+                     mode: str = "hybrid") -> List[dict]:
+        """`top_k` ranked by reciprocal-rank fusion of the dense and BM25 rankings.
+
+        With mode="lexical" only the BM25 ranking is used. A row is kept if
+        its cosine similarity reaches `threshold` or its BM25 score reaches
+        HYBRID_MIN_BM25_RATIO of the query's weight (`BM25Index.query_weight`),
+        so rare names matched verbatim are not cut off whatever the corpus size.
+        """
+        depth = max(k, HYBRID_CANDIDATES)
+        lexical_ids, lexical_scores = self.lexical().search(query_text, depth)
+        min_bm25 = HYBRID_MIN_BM25_RATIO * self.lexical().query_weight(query_text)
+        rankings = [lexical_ids]
+        if mode != "lexical":
+            rankings.append(self.search(query_embedding, depth)[0])
+        fused, _ = reciprocal_rank_fusion(rankings, RRF_K)
+        if not len(fused):
+            return []
+
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+        similarities = self.matrix[fused] @ query
+        bm25 = dict(zip(lexical_ids.tolist(), lexical_scores.tolist()))
+        matches = []
+        for i, similarity in zip(fused.tolist(), similarities.tolist()):
+            if similarity >= threshold or (min_bm25 and bm25.get(i, 0.0) >= min_bm25):
+                matches.append({**self.rows[i], "similarity": round(similarity, 4)})
+                if len(matches) == k:
+                    break
+        return matches
+
+    def extended(self, rows: List[dict], embeddings) -> "VectorIndex":
+        """Return a new index with `rows` appended; this one keeps serving meanwhile."""
+        added = _normalize(np.asarray(embeddings, dtype=np.float32))
+        if len(self) == 0:
+            return VectorIndex(list(rows), added, engine=self.engine, normalized=True,
+                               text_fields=self.text_fields, model_tag=self.model_tag)
+
+        index = VectorIndex.__new__(VectorIndex)
+        index.matrix = np.ascontiguousarray(np.vstack([self.matrix, added]))
+        index.rows = self.rows + list(rows)
+        index.engine = self.engine
+        index.backend = self.backend.extended(index.matrix, added)
+        index.text_fields = self.text_fields
+        index.model_tag = self.model_tag
+        index._lexical = None
+        return index
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalise a vector or each row of a matrix, leaving zero vectors as is."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def load_qa_corpus(version: EmbeddingVersion = LEGACY_VERSION) -> Tuple[List[dict], np.ndarray]:
+    """Load the QA metadata rows and their embedding matrix for `version`.
+
+    With EMBEDDING_FORMAT=f32 the embeddings are bulk-loaded from the
+    binary column; otherwise the JSON-text column is decoded row by row.
+    """
+    if EMBEDDING_FORMAT == "f32":
+        with db_connection(statement_timeout_ms=0) as conn:
+            return embedding_store.load_embeddings(conn, TABLE_NAME, QA_COLUMNS,
+                                                   version.dim, version.column)
+
+    rows = [row for row in get_all_embeddings(version.column) if row[4]]
+    return ([dict(zip(QA_COLUMNS, row[:4])) for row in rows],
+            np.asarray([row[4] for row in rows], dtype=np.float32))
+
+
+def load_med_corpus(version: EmbeddingVersion = LEGACY_VERSION) -> Tuple[List[dict], np.ndarray]:
+    """Load the medication metadata rows and their embedding matrix for `version`."""
+    if EMBEDDING_FORMAT == "f32":
+        with db_connection(statement_timeout_ms=0) as conn:
+            return embedding_store.load_embeddings(conn, MED_TABLE, MED_COLUMNS,
+                                                   version.dim, version.column)
+
+    rows = [row for row in get_all_embeddings_medoc(version.column) if row[5]]
+    return ([dict(zip(MED_COLUMNS, row[:5])) for row in rows],
+            np.asarray([row[5] for row in rows], dtype=np.float32))
+
+
+def get_qa_index() -> VectorIndex:
+    """Return the QA index, from the shared snapshot when SNAPSHOT_DIR is set."""
+    if SNAPSHOT_DIR:
+        return _snapshot_indexes.get("qa")
+    return qa_corpus.get()
+
+
+def get_med_index() -> VectorIndex:
+    """Return the medication index, from the shared snapshot when SNAPSHOT_DIR is set."""
+    if SNAPSHOT_DIR:
+        return _snapshot_indexes.get("med")
+    return med_corpus.get()
+
+
+def fetch_rows_after(conn, table: str, columns: Tuple[str, ...], after_id: int,
+                     source: str = LEGACY_COLUMN) -> Tuple[int, List[dict], np.ndarray]:
+    """Fetch rows with an id above `after_id` for an incremental refresh.
+
+    Returns the number of rows read from the database (including any that
+    failed to decode), the decoded metadata rows and their embeddings.
+    """
+    column = _embedding_column(source)
+    with conn.cursor() as cur:
+        cur.execute(
+            f"""SELECT {", ".join(columns)}, {column} FROM {table}
+            WHERE id > %s AND {column} IS NOT NULL ORDER BY id""", (after_id,))
+        fetched = cur.fetchall()
+    conn.rollback()
+
+    rows, embeddings = [], []
+    for row in fetched:
+        try:
+            if EMBEDDING_FORMAT == "f32":
+                embedding = np.frombuffer(row[-1], dtype="<f4")
+            else:
+                embedding = json.loads(row[-1])
+        except (json.JSONDecodeError, TypeError, ValueError):
+            print(f"Erreur de décodage JSON pour l'entrée : {row[0]}")
+            continue
+        if len(embedding):
+            rows.append(dict(zip(columns, row[:-1])))
+            embeddings.append(embedding)
+    return len(fetched), rows, np.asarray(embeddings, dtype=np.float32)
+
+
+def _embedding_column(source: str = LEGACY_COLUMN) -> str:
+    """Column holding the embeddings of `source` for the configured EMBEDDING_FORMAT."""
+    return binary_column(source) if EMBEDDING_FORMAT == "f32" else source
+
+
+class CorpusCache:
+    """In-memory index over a table, kept fresh in the background.
+
+    The first `get` loads the whole table. Afterwards, once `refresh_seconds`
+    have elapsed, a background thread compares max(id) and count(*) with
+    the loaded state: new rows are appended incrementally, deletions trigger
+    a full reload. Embeddings rewritten in place (UPDATE) are not detected;
+    reload with `POST /admin/reload?full=true` after such a rewrite. Requests
+    keep using the current index until the new one is swapped in.
+
+    The embedding column is the version registered for the query encoder
+    (EMBEDDING_MODEL); it is re-resolved at each refresh, and loading fails
+    with EmbeddingVersionError while that model has no complete column.
+    """
+
+    def __init__(self, name: str, table: str, columns: Tuple[str, ...], loader,
+                 refresh_seconds: float = CORPUS_REFRESH_SECONDS,
+                 text_fields: Tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.table = table
+        self.columns = columns
+        self.text_fields = text_fields
+        self.loader = loader
+        self.refresh_seconds = refresh_seconds
+        self._index: Optional[VectorIndex] = None
+        self.version: Optional[EmbeddingVersion] = None
+        self._watermark = (None, 0)  # (max(id), count(*)) au dernier chargement
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
 
-    docs = [row[3] for row in rows]
-    similarities = cosine_similarity([query_embedding], docs)[0]
-    best_idx = np.argmax(similarities)
+    def get(self) -> VectorIndex:
+        """Return the current index, scheduling a refresh when it is due."""
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._full_reload()
+        elif self.refresh_seconds and \
+                time.monotonic() - self._checked_at >= self.refresh_seconds:
+            self.refresh_in_background()
+        return self._index
 
-    if similarities[best_idx] < 0.5:
-        return None
+    def refresh_in_background(self, full: bool = False) -> bool:
+        """Start a refresh thread unless one is already running."""
+        with self._lock:
+            if self._refreshing:
+                return False
+            self._refreshing = True
+        threading.Thread(target=self._refresh, args=(full,), daemon=True,
+                         name=f"refresh-{self.name}").start()
+        return True
 
-    return {
-        "answer": rows[best_idx][0],
-        "source": rows[best_idx][1],
-        "focus_area": rows[best_idx][2],
-        "similarity": round(similarities[best_idx], 4)
-    }
+    def status(self) -> dict:
+        """Describe the loaded corpus, for the admin endpoint."""
+        return {
+            "corpus": self.name,
+            "rows": len(self._index) if self._index is not None else 0,
+            "model": self.version.tag if self.version else None,
+            "column": self.version.column if self.version else None,
+            "max_id": self._watermark[0],
+            "refreshing": self._refreshing,
+            "seconds_since_check": round(time.monotonic() - self._checked_at, 1),
+        }
 
+    def _refresh(self, full: bool) -> None:
+        try:
+            if full or self._index is None or self._serving_version() != self.version:
+                self._full_reload()
+                return
 
-@lru_cache(maxsize=1000)
-def get_all_embeddings_medoc() -> List[Tuple[str, str, str, str, List[float]]]:
-    """Récupère les embeddings de PostgreSQL en excluant l'ID pour optimiser les requêtes."""
-    conn = connect_db()
+            max_id, count = self._table_stats(self.version.column)
+            known_max_id, known_count = self._watermark
+            if (max_id, count) == (known_max_id, known_count):
+                self._checked_at = time.monotonic()
+                return
+
+            with db_connection(statement_timeout_ms=0) as conn:
+                fetched, rows, embeddings = fetch_rows_after(
+                    conn, self.table, self.columns, known_max_id or 0, self.version.column)
+
+            if known_count + fetched == count:
+                if rows:
+                    self._index = _with_lexical(self._index.extended(rows, embeddings))
+                self._watermark = (max_id, count)
+                self._checked_at = time.monotonic()
+                print(f"Corpus {self.name} : {len(rows)} nouvelles lignes ajoutées")
+            else:
+                self._full_reload()
+        except Exception as e:  # pylint: disable=broad-except
+            # On garde l'index courant, nouvelle tentative au prochain intervalle
+            self._checked_at = time.monotonic()
+            print(f"Échec du rafraîchissement du corpus {self.name} : {e}")
+        finally:
+            self._refreshing = False
+
+    def _full_reload(self) -> None:
+        version = self._serving_version()
+        rows, embeddings = self.loader(version)
+        # Index FAISS par version : un changement de modèle ne réutilise pas l'ancien
+        index_name = self.name if version.column == LEGACY_COLUMN \
+            else f"{self.name}_{version.column}"
+        index = _with_lexical(VectorIndex(
+            rows, embeddings, engine=ANN_ENGINE, text_fields=self.text_fields,
+            model_tag=version.tag,
+            index_path=os.path.join(ANN_INDEX_DIR, f"{index_name}_{ANN_ENGINE}.faiss")))
+        # Lu après le chargement : une ligne insérée entre-temps fera différer
+        # count(*) et déclenchera un rechargement complet au prochain contrôle.
+        self._watermark = self._table_stats(version.column)
+        self._index, self.version = index, version
+        self._checked_at = time.monotonic()
+        print(f"Corpus {self.name} chargé : {len(index)} lignes ({version.tag})")
+
+    def _serving_version(self) -> EmbeddingVersion:
+        with db_connection() as conn:
+            return serving_version(conn, self.table)
+
+    def _table_stats(self, source: str) -> Tuple[Optional[int], int]:
+        with db_connection(statement_timeout_ms=0) as conn:
+            with conn.cursor() as cur:
+                db_pool.execute(
+                    cur, f"""SELECT max(id), count(*) FROM {self.table}
+                    WHERE {_embedding_column(source)} IS NOT NULL""")
+                max_id, count = cur.fetchone()
+            conn.rollback()
+            return max_id, count
+
+
+def _with_lexical(index: VectorIndex) -> VectorIndex:
+    """Build the BM25 index before the swap when the retrieval mode needs it."""
+    if RETRIEVAL_MODE != "dense" and index.text_fields:
+        index.lexical()
+    return index
+
+
+qa_corpus = CorpusCache("qa", TABLE_NAME, QA_COLUMNS, load_qa_corpus,
+                        text_fields=QA_TEXT_FIELDS)
+med_corpus = CorpusCache("med", MED_TABLE, MED_COLUMNS, load_med_corpus,
+                         text_fields=MED_TEXT_FIELDS)
+
+
+SNAPSHOT_TEXT_FIELDS = {"qa": QA_TEXT_FIELDS, "med": MED_TEXT_FIELDS}
+
+
+class _SnapshotIndexes:
+    """Memory-mapped snapshot indexes, reopened when a new version is published.
+
+    The CURRENT pointer is checked at most every SNAPSHOT_POLL_SECONDS, so a
+    refreshed snapshot is picked up without restarting the workers.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._indexes = {}
+
+    def get(self, name: str) -> VectorIndex:
+        """Return the index for `name`, reloading it if the snapshot changed."""
+        entry = self._indexes.get(name)
+        now = time.monotonic()
+        if entry and now - entry["checked"] < SNAPSHOT_POLL_SECONDS:
+            return entry["index"]
+
+        with self._lock:
+            entry = self._indexes.get(name)
+            version = snapshot.current_version(name)
+            if entry is None or entry["version"] != version:
+                version, rows, matrix, tag = snapshot.load_snapshot(name, version=version)
+                entry = {"version": version, "index": _with_lexical(VectorIndex(
+                    rows, matrix, engine=ANN_ENGINE, normalized=True,
+                    text_fields=SNAPSHOT_TEXT_FIELDS.get(name, ()), model_tag=tag,
+                    index_path=os.path.join(ANN_INDEX_DIR, f"{name}_{ANN_ENGINE}.faiss")))}
+                print(f"Snapshot {name} chargé : version {version}")
+            entry["checked"] = now
+            self._indexes[name] = entry
+            return entry["index"]
+
+
+_snapshot_indexes = _SnapshotIndexes()
+_database_versions = {}  # table -> (version, instant de la résolution)
+
+
+def _database_version(table: str) -> EmbeddingVersion:
+    """Serving version for SEARCH_MODE=database, re-resolved every CORPUS_REFRESH_SECONDS."""
+    cached = _database_versions.get(table)
+    if cached and time.monotonic() - cached[1] < CORPUS_REFRESH_SECONDS:
+        return cached[0]
+    with db_connection() as conn:
+        version = serving_version(conn, table)
+    _database_versions[table] = (version, time.monotonic())
+    return version
+
+
+def _checked_index(get_index, query_dim: int) -> VectorIndex:
+    """The index of a corpus, refused (503) if it was not built with the query encoder."""
     try:
+        index = get_index()
+    except EmbeddingVersionError as e:
+        raise HTTPException(status_code=503, detail=str(e)) from e
+    if index.model_tag != QUERY_MODEL_TAG or \
+            (len(index) and index.matrix.shape[1] != query_dim):
+        raise HTTPException(
+            status_code=503,
+            detail=f"Corpus embeddings ({index.model_tag}) do not match "
+                   f"the query encoder ({QUERY_MODEL_TAG}).")
+    return index
+
+
+def _search(get_index, table: str, columns: Tuple[str, ...], query_embedding: List[float],
+            k: int, threshold: float, query_text: Optional[str]) -> List[dict]:
+    """Top-k search shared by the QA and medication corpora.
+
+    With SEARCH_MODE=database the ranking runs in PostgreSQL through
+    pgvector and the in-memory index is never built (dense ranking only).
+    Otherwise RETRIEVAL_MODE=lexical or hybrid ranks with BM25 on
+    `query_text` (fused with the dense ranking for hybrid). Either way, the
+    embeddings searched are those of the query encoder's model version.
+    """
+    if SEARCH_MODE == "database":
+        try:
+            version = _database_version(table)
+        except EmbeddingVersionError as e:
+            raise HTTPException(status_code=503, detail=str(e)) from e
+        with db_connection() as conn:
+            return pgvector_store.search(conn, table, columns, query_embedding, k, threshold,
+                                         source=version.column)
+    index = _checked_index(get_index, len(query_embedding))
+    if RETRIEVAL_MODE != "dense" and query_text:
+        return index.hybrid_top_k(
+            query_text, query_embedding, k, threshold, mode=RETRIEVAL_MODE)
+    return index.top_k(query_embedding, k, threshold)
+
+
+def find_top_matches(query_embedding: List[float], k: int = 5,
+                     threshold: float = SIMILARITY_THRESHOLD,
+                     query_text: Optional[str] = None) -> List[dict]:
+    """Return up to k QA matches above the threshold, best first."""
+    return _search(get_qa_index, TABLE_NAME, QA_COLUMNS, query_embedding,
+                   k, threshold, query_text)
+
+
+def find_best_match(query_embedding: List[float],
+                    query_text: Optional[str] = None) -> Optional[dict]:
+    """Find the best match for the given query embedding (and text, for BM25)."""
+    matches = find_top_matches(query_embedding, k=1, query_text=query_text)
+    return matches[0] if matches else None
+
+
+def find_top_matches_batch(query_embeddings: List[List[float]], k: int = 5,
+                           query_texts: Optional[List[str]] = None) -> List[List[dict]]:
+    """`find_top_matches` for several queries; dense queries share one pass over the corpus."""
+    if SEARCH_MODE == "database" or (RETRIEVAL_MODE != "dense" and query_texts):
+        return [find_top_matches(embedding, k, query_text=text) for embedding, text
+                in zip(query_embeddings, query_texts or [None] * len(query_embeddings))]
+    if not len(query_embeddings):
+        return []
+    return _checked_index(get_qa_index, len(query_embeddings[0])).top_k_batch(
+        query_embeddings, k)
+
+
+def find_best_matches_batch(query_embeddings: List[List[float]],
+                            query_texts: Optional[List[str]] = None) -> List[Optional[dict]]:
+    """`find_best_match` for several queries, scored in one pass over the corpus."""
+    matches = find_top_matches_batch(query_embeddings, k=1, query_texts=query_texts)
+    return [found[0] if found else None for found in matches]
+
+
+def get_all_embeddings_medoc(
+        column: str = LEGACY_COLUMN) -> List[Tuple[str, str, str, str, str, List[float]]]:
+    """Récupère les fiches médicaments et leurs embeddings (`column`) depuis PostgreSQL.
+
+    Not cached: callers should go through `get_med_index`.
+    """
+    with db_connection(statement_timeout_ms=0) as conn:
         with conn.cursor() as cur:
             cur.execute(
-                """SELECT drug, indication, side_effects, drug_interaction,
-                embedding FROM ae_med_table WHERE embedding IS NOT NULL"""
+                f"""SELECT {", ".join(MED_COLUMNS)},
+                {column} FROM {MED_TABLE} WHERE {column} IS NOT NULL"""
             )
             rows = cur.fetchall()
 
         cleaned_rows = []
         for row in rows:
             try:
-                embedding = json.loads(row[4]) if row[4] is not None else []
-                cleaned_rows.append(
-                    (row[0], row[1], row[2], row[3], embedding))
+                embedding = json.loads(row[5]) if row[5] is not None else []
+                cleaned_rows.append((*row[:5], embedding))
             except json.JSONDecodeError:
                 print(f"Erreur de décodage JSON pour l'entrée : {row[0]}")
 
         return cleaned_rows
-    finally:
-        conn.close()
-
-
-def find_best_matches_medoc(query_embedding: List[float], top_n: int = 3) -> Optional[dict]:
-    """Retourne une moyenne des similarités des N meilleurs résultats."""
-    rows = get_all_embeddings()
-    if not rows:
-        return None
-
-    docs = [row[4] for row in rows]
-    similarities = cosine_similarity([query_embedding], docs)[0]
-
-    # Sélection des N meilleures similarités
-    top_indices = np.argsort(similarities)[-top_n:]
-    avg_similarity = np.mean([similarities[i] for i in top_indices])
-
-    return {
-        "top_n_avg_similarity": round(avg_similarity, 4),
-        "top_matches": [
-            {
-                "drug": rows[i][0],
-                "indication": rows[i][1],
-                "side_effects": rows[i][2],
-                "drug_interaction": rows[i][3],
-                "similarity": round(similarities[i], 4)
-            }
-            for i in top_indices
-        ]
-    }
+
+
+def get_drug_names() -> List[str]:
+    """Récupère la liste des noms de médicaments de ae_med_table."""
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT DISTINCT drug FROM ae_med_table WHERE drug IS NOT NULL")
+            return [row[0] for row in cur.fetchall()]
+
+
+def get_drug_record(drug: str) -> Optional[dict]:
+    """Récupère la fiche d'un médicament de ae_med_table par son nom exact."""
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            db_pool.execute(
+                cur, """SELECT drug, indication, side_effects, drug_interaction, dosage
+                FROM ae_med_table WHERE lower(drug) = lower(%s) LIMIT 1""", (drug,))
+            row = cur.fetchone()
+        if row is None:
+            return None
+        return dict(zip(("drug", "indication", "side_effects", "drug_interaction", "dosage"), row))
+
+
+def find_top_matches_medoc(query_embedding: List[float], k: int = 3,
+                           threshold: float = SIMILARITY_THRESHOLD,
+                           query_text: Optional[str] = None) -> List[dict]:
+    """Return up to k medications above the threshold, best first.
+
+    Each match holds the MED_COLUMNS fields and its `similarity`.
+    """
+    return _search(get_med_index, MED_TABLE, MED_COLUMNS, query_embedding,
+                   k, threshold, query_text)
+
+
+def find_best_match_medoc(query_embedding: List[float],
+                          query_text: Optional[str] = None) -> Optional[dict]:
+    """Find the medication closest to the query, in the `find_top_matches_medoc` schema."""
+    matches = find_top_matches_medoc(query_embedding, k=1, query_text=query_text)
+    return matches[0] if matches else None
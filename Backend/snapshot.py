@@ -0,0 +1,121 @@
+""" this module exports the retrieval corpora to versioned snapshot files
+    (normalised float32 `.npy` + JSON metadata sidecar) that API workers
+    memory-map, so every uvicorn worker shares one page-cached copy.
+
+    Layout:
+        {SNAPSHOT_DIR}/{name}/{version}/embeddings.npy
+        {SNAPSHOT_DIR}/{name}/{version}/meta.json
+        {SNAPSHOT_DIR}/{name}/CURRENT      <- version in use, swapped atomically
+
+    Export (from the Backend directory):
+        SNAPSHOT_DIR=snapshots python snapshot.py qa
+        SNAPSHOT_DIR=snapshots python snapshot.py med
+    """
+import argparse
+import json
+import os
+import shutil
+import time
+from typing import List, Optional, Tuple
+import numpy as np
+from config import SNAPSHOT_DIR
+from embedding_versions import LEGACY_VERSION
+
+EMBEDDINGS_FILE = "embeddings.npy"
+META_FILE = "meta.json"
+CURRENT_FILE = "CURRENT"
+KEEP_VERSIONS = 3
+
+
+def export_snapshot(name: str, rows: List[dict], embeddings: np.ndarray,
+                    root: str = SNAPSHOT_DIR, model_tag: str = LEGACY_VERSION.tag) -> str:
+    """Write a new snapshot version and make it current. Returns the version.
+
+    Embeddings are L2-normalised before writing so readers can use the
+    memory-mapped matrix as is; `model_tag` records the model that produced them.
+    """
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix = np.ascontiguousarray(matrix / norms)
+
+    version = time.strftime("%Y%m%dT%H%M%S") + f"-{os.getpid()}"
+    version_dir = os.path.join(root, name, version)
+    os.makedirs(version_dir)
+    np.save(os.path.join(version_dir, EMBEDDINGS_FILE), matrix)
+    with open(os.path.join(version_dir, META_FILE), "w", encoding="utf-8") as file:
+        json.dump({"version": version, "model": model_tag, "count": len(rows),
+                   "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+                   "rows": rows}, file, ensure_ascii=False)
+
+    # Bascule atomique : les workers lisent soit l'ancienne, soit la nouvelle version
+    current_path = os.path.join(root, name, CURRENT_FILE)
+    with open(f"{current_path}.tmp", "w", encoding="utf-8") as file:
+        file.write(version)
+    os.replace(f"{current_path}.tmp", current_path)
+
+    _prune(os.path.join(root, name), version)
+    return version
+
+
+def current_version(name: str, root: str = SNAPSHOT_DIR) -> Optional[str]:
+    """Return the version currently published for `name`, if any."""
+    try:
+        with open(os.path.join(root, name, CURRENT_FILE), encoding="utf-8") as file:
+            return file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def load_snapshot(name: str, root: str = SNAPSHOT_DIR, version: Optional[str] = None
+                  ) -> Tuple[str, List[dict], np.ndarray, str]:
+    """Open a snapshot: the matrix is memory-mapped read-only, not copied.
+
+    Returns the version, rows, matrix and embedding model tag (snapshots
+    written before model tagging are from the original model).
+    """
+    version = version or current_version(name, root)
+    if version is None:
+        raise FileNotFoundError(f"No snapshot published for '{name}' in {root}")
+    version_dir = os.path.join(root, name, version)
+    matrix = np.load(os.path.join(version_dir, EMBEDDINGS_FILE), mmap_mode="r")
+    with open(os.path.join(version_dir, META_FILE), encoding="utf-8") as file:
+        meta = json.load(file)
+    rows = meta["rows"]
+    if len(rows) != len(matrix):
+        raise ValueError(f"Snapshot {name}/{version} metadata does not match embeddings")
+    return version, rows, matrix, meta.get("model", LEGACY_VERSION.tag)
+
+
+def _prune(name_dir: str, current: str) -> None:
+    """Delete old versions, keeping the most recent ones for workers still on them."""
+    versions = sorted(entry for entry in os.listdir(name_dir)
+                      if os.path.isdir(os.path.join(name_dir, entry)))
+    for version in versions[:-KEEP_VERSIONS]:
+        if version != current:
+            shutil.rmtree(os.path.join(name_dir, version), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a retrieval snapshot.")
+    parser.add_argument("corpus", choices=("qa", "med"))
+    parser.add_argument("--root", default=SNAPSHOT_DIR or "snapshots")
+    args = parser.parse_args()
+
+    # pylint: disable=import-outside-toplevel
+    from embedding_versions import serving_version
+    from retrieve import (connect_db, load_qa_corpus, load_med_corpus,
+                          TABLE_NAME, MED_TABLE)
+    loaders = {"qa": (TABLE_NAME, load_qa_corpus), "med": (MED_TABLE, load_med_corpus)}
+    table, loader = loaders[args.corpus]
+    # Version servie par le modèle configuré (EMBEDDING_MODEL)
+    connection = connect_db()
+    try:
+        embedding_version = serving_version(connection, table)
+    finally:
+        connection.close()
+    corpus_rows, corpus_embeddings = loader(embedding_version)
+    published = export_snapshot(args.corpus, corpus_rows, corpus_embeddings, args.root,
+                                embedding_version.tag)
+    print(f"Snapshot {args.corpus} {published} publié ({len(corpus_rows)} lignes, "
+          f"{embedding_version.tag})")
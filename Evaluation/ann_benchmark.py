@@ -0,0 +1,89 @@
+"""Recall@k vs. latency report of the ANN engines against the exact scan.
+
+Usage (from the repository root, with Backend on the path):
+    PYTHONPATH=Backend python Evaluation/ann_benchmark.py --k 5 --queries 200
+    PYTHONPATH=Backend python Evaluation/ann_benchmark.py --synthetic 200000
+"""
+import argparse
+import time
+import numpy as np
+from ann import build_search
+
+
+NPROBE_SWEEP = (1, 2, 4, 8, 16, 32, 64)
+EF_SEARCH_SWEEP = (16, 32, 64, 128, 256)
+
+
+def load_corpus(synthetic: int, dim: int) -> np.ndarray:
+    """Load the QA embeddings, or generate a random corpus of the given size."""
+    if synthetic:
+        rng = np.random.default_rng(0)
+        matrix = rng.standard_normal((synthetic, dim), dtype=np.float32)
+    else:
+        from retrieve import get_qa_index  # pylint: disable=import-outside-toplevel
+        matrix = get_qa_index().matrix
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+
+def run_queries(backend, queries: np.ndarray, k: int):
+    """Return the result ids and per-query latencies (ms) for one backend."""
+    results, latencies = [], []
+    for query in queries:
+        start_time = time.perf_counter()
+        indices, _ = backend.search(query, k)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+        results.append(set(indices.tolist()))
+    return results, np.array(latencies)
+
+
+def report(label: str, results, truth, latencies: np.ndarray) -> None:
+    """Print one line of the recall/latency table."""
+    recall = np.mean([len(r & t) / len(t) for r, t in zip(results, truth)])
+    print(f"{label:<22} recall@k={recall:.4f}  "
+          f"mean={latencies.mean():.3f} ms  p95={np.percentile(latencies, 95):.3f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="benchmark a random corpus of this size instead of the database")
+    parser.add_argument("--dim", type=int, default=768)
+    args = parser.parse_args()
+
+    matrix = load_corpus(args.synthetic, args.dim)
+    rng = np.random.default_rng(1)
+    # Requêtes : vecteurs du corpus légèrement bruités, puis renormalisés
+    queries = matrix[rng.choice(len(matrix), size=min(args.queries, len(matrix)),
+                                replace=False)]
+    queries = queries + rng.normal(0, 0.05, queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    print(f"Corpus: {matrix.shape[0]} x {matrix.shape[1]}, "
+          f"{len(queries)} queries, k={args.k}\n")
+
+    truth, latencies = run_queries(build_search(matrix, "exact"), queries, args.k)
+    report("exact", truth, truth, latencies)
+
+    start_time = time.perf_counter()
+    ivf = build_search(matrix, "ivf")
+    print(f"\nivf build: {time.perf_counter() - start_time:.2f} s")
+    for nprobe in NPROBE_SWEEP:
+        ivf.set_params(nprobe=nprobe)
+        results, latencies = run_queries(ivf, queries, args.k)
+        report(f"ivf nprobe={nprobe}", results, truth, latencies)
+
+    start_time = time.perf_counter()
+    hnsw = build_search(matrix, "hnsw")
+    print(f"\nhnsw build: {time.perf_counter() - start_time:.2f} s")
+    for ef_search in EF_SEARCH_SWEEP:
+        hnsw.set_params(ef_search=ef_search)
+        results, latencies = run_queries(hnsw, queries, args.k)
+        report(f"hnsw efSearch={ef_search}", results, truth, latencies)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Throughput of per-call encoding vs. the micro-batching embedding service.
+
+Usage (from the repository root):
+    PYTHONPATH=Backend python Evaluation/embedding_benchmark.py --threads 16
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from sentence_transformers import SentenceTransformer
+from embedding_service import EmbeddingService
+
+
+def run(embed, texts, threads: int) -> float:
+    """Embed every text from `threads` concurrent callers; return texts/sec."""
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(embed, texts))
+    return len(texts) / (time.perf_counter() - start_time)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--texts", type=int, default=256)
+    parser.add_argument("--csv", default="Datasets/metrics_log.csv")
+    args = parser.parse_args()
+
+    queries = pd.read_csv(args.csv)["query"].dropna().astype(str).tolist()
+    # Textes distincts pour mesurer le batching et non le cache
+    texts = [f"{queries[i % len(queries)]} #{i}" for i in range(args.texts)]
+
+    model = SentenceTransformer("sentence-transformers/all-mpnet-base-v2")
+    model.encode(texts[:8])  # préchauffage
+
+    baseline = run(lambda text: model.encode(text, normalize_embeddings=True),
+                   texts, args.threads)
+    service = EmbeddingService(
+        lambda batch: model.encode(batch, normalize_embeddings=True), cache_size=0)
+    batched = run(service.embed, texts, args.threads)
+
+    print(f"{args.texts} texts, {args.threads} concurrent callers")
+    print(f"per-call encode : {baseline:8.1f} texts/s")
+    print(f"micro-batched   : {batched:8.1f} texts/s  "
+          f"({batched / baseline:.1f}x, {service.stats['batches']} batches)")
+
+
+if __name__ == "__main__":
+    main()
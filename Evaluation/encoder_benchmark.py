@@ -0,0 +1,92 @@
+"""Parity and latency/memory of the ONNX query encoders against the torch model.
+
+A backend passes when its top-1 QA match equals the torch top-1 for at least
+--min-agreement of the queries. Export the ONNX models first
+(python Backend/onnx_encoder.py --quantize, from Backend).
+
+Usage (from the repository root):
+    PYTHONPATH=Backend python Evaluation/encoder_benchmark.py --queries 500
+"""
+import argparse
+import sys
+import time
+import numpy as np
+import pandas as pd
+from config import ONNX_MODEL_DIR, EMBEDDING_MODEL
+from retrieve import get_qa_index
+
+
+def rss_mb() -> float:
+    """Resident set size of this process in MB (Linux)."""
+    with open("/proc/self/status", encoding="utf-8") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def load(backend: str):
+    """Load one encoder; return it with its load time (s) and RSS growth (MB)."""
+    # pylint: disable=import-outside-toplevel
+    before, start_time = rss_mb(), time.perf_counter()
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        encoder = SentenceTransformer(EMBEDDING_MODEL)
+    else:
+        from onnx_encoder import OnnxEncoder
+        encoder = OnnxEncoder(ONNX_MODEL_DIR, quantized=backend == "onnx-int8")
+    return encoder, time.perf_counter() - start_time, rss_mb() - before
+
+
+def encode_timed(encoder, queries):
+    """Encode each query alone, as the API does; return embeddings and latencies (ms)."""
+    encoder.encode(queries[:4], normalize_embeddings=True)  # préchauffage
+    embeddings, latencies = [], []
+    for query in queries:
+        start_time = time.perf_counter()
+        embeddings.append(encoder.encode(query, normalize_embeddings=True))
+        latencies.append((time.perf_counter() - start_time) * 1000)
+    return np.asarray(embeddings, dtype=np.float32), np.array(latencies)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--csv", default="Datasets/metrics_log.csv")
+    parser.add_argument("--backends", nargs="+", default=["onnx", "onnx-int8"])
+    parser.add_argument("--min-agreement", type=float, default=0.99)
+    args = parser.parse_args()
+
+    queries = pd.read_csv(args.csv)["query"].dropna().astype(str).drop_duplicates()
+    queries = queries.head(args.queries).tolist()
+    index = get_qa_index()
+    print(f"Corpus: {len(index)} rows, {len(queries)} queries\n")
+
+    # Les modèles ONNX sont chargés avant torch : la croissance du RSS de
+    # torch inclurait sinon celle de ses bibliothèques partagées
+    results = {}
+    for backend in args.backends + ["torch"]:
+        encoder, load_time, memory = load(backend)
+        embeddings, latencies = encode_timed(encoder, queries)
+        top1, _ = index.search_batch(embeddings, 1)
+        results[backend] = (top1[:, 0], embeddings, latencies, load_time, memory)
+        del encoder
+
+    reference, reference_embeddings = results["torch"][0], results["torch"][1]
+    failed = False
+    print(f"{'backend':<10} {'top-1 agree':>11} {'min cos':>8} {'mean ms':>8} "
+          f"{'p95 ms':>7} {'load s':>7} {'RSS MB':>7}")
+    for backend, (top1, embeddings, latencies, load_time, memory) in results.items():
+        agreement = float(np.mean(top1 == reference))
+        cosine = float(np.min(np.sum(embeddings * reference_embeddings, axis=1)))
+        print(f"{backend:<10} {agreement:>11.2%} {cosine:>8.4f} {latencies.mean():>8.2f} "
+              f"{np.percentile(latencies, 95):>7.2f} {load_time:>7.1f} {memory:>7.0f}")
+        failed |= agreement < args.min_agreement
+
+    if failed:
+        print(f"\nÉCHEC : accord top-1 inférieur à {args.min_agreement:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,20 +2,16 @@
 import requests
 import numpy as np
 from Backend.config import TABLE_NAME
-from Backend.retrieve import connect_db
+from Backend.retrieve import db_connection
 from Evaluation.metrics import evaluate_metrics
 
 
 def get_random_questions(n):
     """Récupère n questions aléatoires depuis la base de données."""
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute(
-        f"SELECT question, answer FROM {TABLE_NAME} ORDER BY RANDOM() LIMIT %s", (n,))
-    data = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return data
+    with db_connection() as conn, conn.cursor() as cursor:
+        cursor.execute(
+            f"SELECT question, answer FROM {TABLE_NAME} ORDER BY RANDOM() LIMIT %s", (n,))
+        return cursor.fetchall()
 
 
 def evaluate_chatbot(n):
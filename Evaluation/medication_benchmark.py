@@ -0,0 +1,76 @@
+"""Regression benchmark of the medication retrieval on templated drug questions.
+
+For drugs of medoc_info.csv present in ae_med_table, questions such as
+"What is <drug> used for?" are embedded and searched; a hit is a match on
+the same drug. The indexed search is compared with the former algorithm
+(scikit-learn cosine_similarity + full argsort) for top-1 parity and latency.
+
+Usage (from the repository root):
+    PYTHONPATH=Backend python Evaluation/medication_benchmark.py --queries 300
+"""
+import argparse
+import random
+import time
+import numpy as np
+import pandas as pd
+from sklearn.metrics.pairwise import cosine_similarity
+from agents import generate_embeddings
+from retrieve import get_med_index, find_top_matches_medoc
+
+TEMPLATES = (
+    "What is {drug} used for?",
+    "What are the side effects of {drug}?",
+    "Can I take {drug} with other medications?",
+    "What is the usual dosage of {drug}?",
+)
+
+
+def legacy_top(query_embedding, matrix: np.ndarray, top_n: int) -> np.ndarray:
+    """Former find_best_matches_medoc ranking: full cosine + argsort."""
+    similarities = cosine_similarity([query_embedding], matrix)[0]
+    return np.argsort(similarities)[-top_n:][::-1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--csv", default="Datasets/medoc_info.csv")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    index = get_med_index()
+    indexed = {row["drug"] for row in index.rows}
+    drugs = [drug for drug in pd.read_csv(args.csv)["drug"].dropna().unique() if drug in indexed]
+    rng = random.Random(0)
+    sample = rng.sample(drugs, min(args.queries, len(drugs)))
+    queries = [rng.choice(TEMPLATES).format(drug=drug) for drug in sample]
+    embeddings = generate_embeddings(queries)
+    print(f"Medication corpus: {len(index)} rows, {len(queries)} queries\n")
+
+    results, latencies = [], []
+    for embedding in embeddings:
+        start_time = time.perf_counter()
+        results.append(find_top_matches_medoc(embedding, args.k, threshold=-1.0))
+        latencies.append((time.perf_counter() - start_time) * 1000)
+
+    legacy, legacy_latencies = [], []
+    for embedding in embeddings:
+        start_time = time.perf_counter()
+        legacy.append(legacy_top(embedding, index.matrix, args.k))
+        legacy_latencies.append((time.perf_counter() - start_time) * 1000)
+
+    hit1 = np.mean([bool(r) and r[0]["drug"] == drug for r, drug in zip(results, sample)])
+    hitk = np.mean([drug in {m["drug"] for m in r} for r, drug in zip(results, sample)])
+    parity = np.mean([bool(r) and r[0]["drug"] == index.rows[top[0]]["drug"]
+                      for r, top in zip(results, legacy)])
+    print(f"hit@1            : {hit1:.2%}")
+    print(f"hit@{args.k}            : {hitk:.2%}")
+    print(f"top-1 parity     : {parity:.2%} (vs. cosine_similarity + argsort)")
+    print(f"indexed search   : mean {np.mean(latencies):.3f} ms, "
+          f"p95 {np.percentile(latencies, 95):.3f} ms")
+    print(f"former algorithm : mean {np.mean(legacy_latencies):.3f} ms, "
+          f"p95 {np.percentile(legacy_latencies, 95):.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
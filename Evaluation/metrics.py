@@ -4,14 +4,13 @@ from typing import Dict
 from rouge_score import rouge_scorer
 from sklearn.metrics.pairwise import cosine_similarity
 from nltk.translate.bleu_score import sentence_bleu
-from agents import generate_embedding
+from agents import generate_embeddings
 
 
 def evaluate_metrics(query: str, answer: str, generated_answer: str) -> Dict[str, Dict[str, float]]:
     """Evaluate similarity and quality metrics for the generated response."""
-    query_embedding = generate_embedding(query)
-    answer_embedding = generate_embedding(answer)
-    generated_answer_embedding = generate_embedding(generated_answer)
+    query_embedding, answer_embedding, generated_answer_embedding = generate_embeddings(
+        [query, answer, generated_answer])
 
     cosine_sim_answer = cosine_similarity(
         [query_embedding], [answer_embedding])[0][0]
@@ -83,8 +82,8 @@ def evaluate_metrics_medoc(question: str, best_match: dict) -> Dict[str, float]:
 
     # Similarité Cosine entre la question et le médicament trouvé
     try:
-        question_embedding = generate_embedding(question)
-        drug_embedding = generate_embedding(best_match["drug"])
+        question_embedding, drug_embedding = generate_embeddings(
+            [question, best_match["drug"]])
         similarity = cosine_similarity(
             [question_embedding], [drug_embedding])[0][0]
         metrics["cosine_similarity"] = round(similarity, 4)
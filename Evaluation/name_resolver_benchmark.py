@@ -0,0 +1,107 @@
+"""Hit rate and latency of the local drug-name resolver on noisy OCR samples.
+
+Each sample is a drug name of medoc_info.csv with simulated OCR noise
+(character confusions, drops, insertions, case, dosage tokens). A hit is a
+sample resolved locally above the threshold; the others escalate to Gemini.
+
+Usage (from the repository root):
+    PYTHONPATH=Backend python Evaluation/name_resolver_benchmark.py --samples 2000
+    PYTHONPATH=Backend python Evaluation/name_resolver_benchmark.py --llm-samples 20
+"""
+import argparse
+import random
+import time
+import numpy as np
+import pandas as pd
+from name_resolver import NameResolver
+
+CONFUSIONS = {"o": "0", "l": "1", "i": "l", "s": "5", "b": "8", "e": "c",
+              "m": "rn", "rn": "m", "cl": "d", "u": "v", "a": "o"}
+DOSAGES = ("500 mg", "1g", "20mg", "10 ml", "250MG")
+
+
+def add_ocr_noise(name: str, rng: random.Random, edits: int) -> str:
+    """Apply `edits` random OCR-like corruptions to a name."""
+    text = name
+    for _ in range(edits):
+        operation = rng.choice(("confuse", "drop", "insert", "swap"))
+        position = rng.randrange(max(1, len(text)))
+        if operation == "confuse":
+            pairs = [(src, dst) for src, dst in CONFUSIONS.items() if src in text.lower()]
+            if pairs:
+                src, dst = rng.choice(pairs)
+                start = text.lower().index(src)
+                text = text[:start] + dst + text[start + len(src):]
+        elif operation == "drop" and len(text) > 3:
+            text = text[:position] + text[position + 1:]
+        elif operation == "insert":
+            text = text[:position] + rng.choice("abcdefghijklmnopqrstuvwxyz .-") + text[position:]
+        elif operation == "swap" and position < len(text) - 1:
+            text = text[:position] + text[position + 1] + text[position] + text[position + 2:]
+    if rng.random() < 0.5:
+        text = text.upper()
+    if rng.random() < 0.3:
+        text = f"{text} {rng.choice(DOSAGES)}"
+    return text
+
+
+def measure_llm(samples, count: int) -> float:
+    """Mean latency (ms) of the Gemini correction on a few samples."""
+    from agents import get_llm, CORRECTION_PROMPT  # pylint: disable=import-outside-toplevel
+    chain = CORRECTION_PROMPT | get_llm()
+    latencies = []
+    for noisy, _ in samples[:count]:
+        start_time = time.perf_counter()
+        chain.invoke({"medication_text": noisy})
+        latencies.append((time.perf_counter() - start_time) * 1000)
+    return float(np.mean(latencies))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--csv", default="Datasets/medoc_info.csv")
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--max-edits", type=int, default=3)
+    parser.add_argument("--llm-ms", type=float, default=1000.0,
+                        help="assumed Gemini correction latency when --llm-samples is 0")
+    parser.add_argument("--llm-samples", type=int, default=0,
+                        help="measure the real Gemini latency on this many samples")
+    args = parser.parse_args()
+
+    names = pd.read_csv(args.csv)["drug"].dropna().astype(str).tolist()
+    start_time = time.perf_counter()
+    resolver = NameResolver(names)
+    print(f"{len(resolver)} names indexed in {(time.perf_counter() - start_time) * 1000:.0f} ms")
+
+    rng = random.Random(0)
+    samples = []
+    for _ in range(args.samples):
+        name = rng.choice(names)
+        samples.append((add_ocr_noise(name, rng, rng.randint(0, args.max_edits)), name))
+
+    hits = correct = 0
+    latencies = []
+    for noisy, name in samples:
+        start_time = time.perf_counter()
+        resolution = resolver.resolve(noisy)
+        latencies.append((time.perf_counter() - start_time) * 1e6)
+        if resolution.accepted:
+            hits += 1
+            correct += resolution.name == name
+    latencies = np.array(latencies)
+
+    llm_ms = measure_llm(samples, args.llm_samples) if args.llm_samples else args.llm_ms
+    print(f"samples            : {len(samples)}")
+    print(f"resolved locally   : {hits / len(samples):.2%} "
+          f"(precision {correct / max(hits, 1):.2%})")
+    print(f"escalated to Gemini: {1 - hits / len(samples):.2%}")
+    print(f"resolver latency   : mean {latencies.mean():.0f} us, "
+          f"p95 {np.percentile(latencies, 95):.0f} us")
+    print(f"Gemini latency     : {llm_ms:.0f} ms "
+          f"({'measured' if args.llm_samples else 'assumed'})")
+    print(f"time saved         : {hits * llm_ms / 1000:.1f} s over {len(samples)} images "
+          f"({hits / len(samples) * llm_ms:.0f} ms per image on average)")
+
+
+if __name__ == "__main__":
+    main()
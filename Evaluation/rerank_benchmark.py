@@ -0,0 +1,60 @@
+"""Added latency and top-1 quality of cross-encoder re-ranking for N candidates.
+
+Queries are questions of the QA corpus (optionally with dropped words); a
+hit is a top-1 document carrying the answer of the question.
+
+Usage (from the repository root):
+    PYTHONPATH=Backend python Evaluation/rerank_benchmark.py --queries 200 --drop 0.3
+"""
+import argparse
+import time
+import numpy as np
+from sentence_transformers import CrossEncoder
+from agents import generate_embeddings
+from config import RERANKER_MODEL
+from reranker import Reranker
+from retrieve import get_qa_index
+from retrieval_benchmark import sample_queries
+
+CANDIDATES = (10, 20, 50)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--drop", type=float, default=0.0)
+    args = parser.parse_args()
+
+    index = get_qa_index()
+    queries, expected = sample_queries(index, args.queries, args.drop)
+    embeddings = generate_embeddings(queries)
+
+    model = CrossEncoder(RERANKER_MODEL, device="cpu")
+    model.predict([("warm up", "warm up")])
+
+    print(f"{len(queries)} queries, model {RERANKER_MODEL}\n")
+    print(f"{'N':>3} {'hit@1 dense':>11} {'hit@1 rerank':>12} "
+          f"{'cold ms':>8} {'p95 ms':>7} {'cached ms':>9}")
+    for n in CANDIDATES:
+        reranker = Reranker(lambda pairs: model.predict(pairs, batch_size=len(pairs)),
+                            budget_ms=0)
+        candidates = [index.top_k(embedding, n, threshold=-1.0) for embedding in embeddings]
+        timings = {"cold": [], "cached": []}
+        reranked = []
+        for phase in ("cold", "cached"):
+            for query, matches in zip(queries, candidates):
+                start_time = time.perf_counter()
+                result = reranker.rerank(query, matches)
+                timings[phase].append((time.perf_counter() - start_time) * 1000)
+                if phase == "cold":
+                    reranked.append(result)
+
+        dense_hits = np.mean([m[0]["answer"] == a for m, a in zip(candidates, expected) if m])
+        rerank_hits = np.mean([m[0]["answer"] == a for m, a in zip(reranked, expected) if m])
+        cold = np.array(timings["cold"])
+        print(f"{n:>3} {dense_hits:>11.2%} {rerank_hits:>12.2%} {cold.mean():>8.1f} "
+              f"{np.percentile(cold, 95):>7.1f} {np.mean(timings['cached']):>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Hit quality and latency of the dense, lexical (BM25) and hybrid retrieval modes.
+
+Queries are questions of the QA corpus, optionally with a fraction of their
+words dropped; a hit is a retrieved row carrying the answer of the question.
+
+Usage (from the repository root):
+    PYTHONPATH=Backend python Evaluation/retrieval_benchmark.py --queries 500 --drop 0.3
+"""
+import argparse
+import random
+import time
+import numpy as np
+from agents import generate_embeddings
+from retrieve import get_qa_index
+
+MODES = ("dense", "lexical", "hybrid")
+
+
+def perturb(question: str, rng: random.Random, drop: float) -> str:
+    """Drop a fraction of the words of a question, keeping at least two."""
+    words = question.split()
+    kept = [word for word in words if rng.random() >= drop]
+    return " ".join(kept if len(kept) >= 2 else words[:2])
+
+
+def sample_queries(index, count: int, drop: float, seed: int = 0):
+    """Perturbed corpus questions and the answers expected for them (shared by the benchmarks)."""
+    rng = random.Random(seed)
+    population = [row for row in index.rows if row.get("question")]
+    sample = rng.sample(population, min(count, len(population)))
+    return ([perturb(row["question"], rng, drop) for row in sample],
+            [row["answer"] for row in sample])
+
+
+def run_mode(index, mode: str, queries, embeddings, k: int):
+    """Ranked answers and retrieval latencies (ms) of one mode."""
+    results, latencies = [], []
+    for query, embedding in zip(queries, embeddings):
+        start_time = time.perf_counter()
+        if mode == "dense":
+            matches = index.top_k(embedding, k, threshold=-1.0)
+        else:
+            matches = index.hybrid_top_k(query, embedding, k, threshold=-1.0, mode=mode)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+        results.append([match["answer"] for match in matches])
+    return results, np.array(latencies)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--drop", type=float, default=0.0,
+                        help="fraction of the words removed from each question")
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    index = get_qa_index()
+    start_time = time.perf_counter()
+    lexical = index.lexical()
+    print(f"Corpus: {len(index)} rows; BM25 built in {time.perf_counter() - start_time:.2f} s "
+          f"({len(lexical.vocabulary)} terms, {len(lexical.doc_ids)} postings, "
+          f"{(lexical.doc_ids.nbytes + lexical.weights.nbytes) / 2**20:.1f} MB)\n")
+
+    queries, expected = sample_queries(index, args.queries, args.drop)
+    embeddings = generate_embeddings(queries)
+
+    print(f"{'mode':<8} {'hit@1':>7} {'hit@5':>7} {f'MRR@{args.k}':>8} "
+          f"{'mean ms':>8} {'p95 ms':>7}")
+    for mode in MODES:
+        results, latencies = run_mode(index, mode, queries, embeddings, args.k)
+        ranks = [answers.index(answer) + 1 if answer in answers else None
+                 for answers, answer in zip(results, expected)]
+        hit1 = np.mean([rank == 1 for rank in ranks])
+        hit5 = np.mean([rank is not None and rank <= 5 for rank in ranks])
+        mrr = np.mean([1 / rank if rank else 0.0 for rank in ranks])
+        print(f"{mode:<8} {hit1:>7.2%} {hit5:>7.2%} {mrr:>8.4f} "
+              f"{latencies.mean():>8.3f} {np.percentile(latencies, 95):>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ This module serves as the main Streamlit application for the Medical Chatbot.
 It provides an intuitive user interface for interacting with the chatbot, analyzing medical images, and collecting feedback for further improvements.
 """
 
+import json
 import streamlit as st
 import requests
 from graphs.graph import generate_and_display_graphs
@@ -10,7 +11,31 @@ from Backend.agents import generate_response, get_medication_details
 
 
 # ------------------- CONFIGURATION -------------------
-API_URL = "http://127.0.0.1:8000/answer"
+API_STREAM_URL = "http://127.0.0.1:8000/answer_stream"
+
+
+def stream_answer(question: str, metadata: dict):
+    """
+    Interroge /answer_stream et renvoie les tokens au fil de l'eau.
+    Les métadonnées (source, focus_area, similarité) sont stockées dans `metadata`.
+    """
+    with requests.post(API_STREAM_URL, json={"question": question},
+                       stream=True, timeout=500) as response:
+        response.raise_for_status()
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+                if event == "token":
+                    yield data["text"]
+                elif event == "message":
+                    yield data["message"]
+                elif event == "metadata":
+                    metadata.update(data)
+                elif event == "error":
+                    raise requests.RequestException(data.get("detail"))
 
 # ------------------- STREAMLIT INTERFACE -------------------
 st.set_page_config(page_title="Patient Assistant",
@@ -122,33 +147,35 @@ with tabs[1]:
 
     question = st.chat_input("Type your message...")
     if question:
-        response = requests.post(
-            API_URL, json={"question": question}, timeout=500)
-        if response.status_code == 200:
-            data = response.json()
-            chatbot_response = data.get('answer')
-            st.session_state.history.append(
-                {
-                    "question": question,
-                    "response": chatbot_response,
-                    "sources": data.get('source', "Unknown source"),
-                    "focus_area": data.get('focus_area', "Not specified"),
-                    "similarity": data.get('similarity', "N/A"),
-                    "similarity_type": data.get('similarity_type', "N/A"),
-                }
-            )
-        else:
-            chatbot_response = generate_response(question, None, "english")
-            st.session_state.history.append(
-                {
-                    "question": question,
-                    "response": chatbot_response,
-                    "sources": "Unknown source",
-                    "focus_area": "Not specified",
-                    "similarity": "N/A",
-                    "similarity_type": "N/A",
-                }
-            )
+        with st.chat_message("user"):
+            st.markdown(f"**🗨️ {question}**")
+        with st.chat_message("assistant"):
+            metadata = {}
+            # Un seul emplacement : la réponse de secours remplace un flux interrompu
+            answer_placeholder = st.empty()
+            try:
+                # Affichage progressif des tokens dès leur arrivée
+                chatbot_response = answer_placeholder.write_stream(
+                    stream_answer(question, metadata))
+            except requests.RequestException:
+                metadata.clear()
+                chatbot_response = generate_response(question, None, "english")
+                answer_placeholder.markdown(chatbot_response)
+            st.markdown(f"🔍 **Source:** {metadata.get('source', 'Unknown source')}")
+            st.markdown(f"📌 **Focus Area:** {metadata.get('focus_area', 'Not specified')}")
+            st.markdown(
+                f"💡 **Similarity Score:** {metadata.get('similarity', 'N/A')} "
+                f"({metadata.get('similarity_type', 'N/A')})")
+        st.session_state.history.append(
+            {
+                "question": question,
+                "response": chatbot_response,
+                "sources": metadata.get('source', "Unknown source"),
+                "focus_area": metadata.get('focus_area', "Not specified"),
+                "similarity": metadata.get('similarity', "N/A"),
+                "similarity_type": metadata.get('similarity_type', "N/A"),
+            }
+        )
 
 # ------------------- 🖼️ MEDICAL IMAGE ANALYSIS -------------------
 with tabs[2]: